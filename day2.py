@@ -85,6 +85,7 @@ in other words, don't reuse memory from a previous attempt.
 Find the input noun and verb that cause the program to produce the output 19690720. What is 100 * noun + verb? 
 (For example, if noun=12 and verb=2, the answer would be 1202.)
 """
+from intcode import VM, parse, solve
 
 puzzle_input = '1,0,0,3,1,1,2,3,1,3,4,3,1,5,0,3,2,13,1,19,1,10,19,23,1,23,9,27,1,5,27,31,2,31,13,35,1,35,5,39,'\
                '1,39,5,43,2,13,43,47,2,47,10,51,1,51,6,55,2,55,9,59,1,59,5,63,1,63,13,67,2,67,6,71,1,71,5,75,1,'\
@@ -92,35 +93,19 @@ puzzle_input = '1,0,0,3,1,1,2,3,1,3,4,3,1,5,0,3,2,13,1,19,1,10,19,23,1,23,9,27,1
                '111,2,6,111,115,1,5,115,119,2,119,13,123,1,6,123,127,2,9,127,131,1,131,5,135,1,135,13,139,1,139,'\
                '10,143,1,2,143,147,1,147,10,0,99,2,0,14,0'
 
-def intcode_program(puzzle_input, noun=12, verb=2):
-    opcodes = puzzle_input.split(',')
-    opcodes[1] = str(noun)
-    opcodes[2] = str(verb)
-    
-    for pos, opcode in enumerate(opcodes):
-        if pos == 0 or pos % 4 == 0:
-            opcode = int(opcode)
-            first_input_pos = 0
-            second_input_pos = 0
-            if opcode == 99:
-                break
-            elif opcode == 1:
-                first_input_pos = int(opcodes[pos + 1])
-                second_input_pos = int(opcodes[pos + 2])
-                output_pos = int(opcodes[pos + 3])
-                opcodes[output_pos] = str(int(opcodes[first_input_pos]) + int(opcodes[second_input_pos]))
-            elif opcode == 2:
-                first_input_pos = int(opcodes[pos + 1])
-                second_input_pos = int(opcodes[pos + 2])
-                output_pos = int(opcodes[pos + 3])
-                opcodes[output_pos] = str(int(opcodes[first_input_pos]) * int(opcodes[second_input_pos]))
-            pos += 4
-    return opcodes
-
-print('>>>RESULT P1: {}'.format(intcode_program(puzzle_input)))
-
-for noun in range(1, 100):
-    for verb in range(1, 100):
-        result = intcode_program(puzzle_input, noun, verb)
-        if int(result[0]) == 19690720:
-            print('>>>RESULT P2: {}'.format(100 * noun + verb))
+program = VM(parse(puzzle_input)).snapshot()
+
+def intcode_program(program, noun=12, verb=2):
+    vm = program.fork()
+    vm[1] = noun
+    vm[2] = verb
+    vm.run()
+    return [str(value) for value in vm.mem[:len(vm.code)]]
+
+if __name__ == '__main__':
+    print('>>>RESULT P1: {}'.format(intcode_program(program)))
+
+    match = solve(program.code, {1: 'noun', 2: 'verb'}, 0, 19690720,
+                  {'noun': range(1, 100), 'verb': range(1, 100)})
+    if match is not None:
+        print('>>>RESULT P2: {}'.format(100 * match[1] + match[2]))
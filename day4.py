@@ -39,33 +39,41 @@ How many different passwords within the range given in your puzzle input
 Your puzzle input is still 172851-675869.
 
 """
-from collections import defaultdict
+from collections import Counter
+from itertools import combinations_with_replacement
 
 puzzle_input = '172851-675869'
 puzzle_input = puzzle_input.split('-')
-numbers = map(str, range(int(puzzle_input[0]), int(puzzle_input[1])))
-
-def check_rules(number):
-    is_decrease = False
-    repeats = defaultdict(int)
-
-    if sorted(number) != list(number):
-        is_decrease = True
-
-    for char in number:
-        if number.count(char) > 1:
-            repeats[char] += 1
-    
-    return repeats, is_decrease
+lo, hi = int(puzzle_input[0]), int(puzzle_input[1])
+
+def non_decreasing(lo, hi):
+    """Digit tuples of the numbers in range(lo, hi) whose digits never decrease, in order.
+
+    combinations_with_replacement yields exactly the non-decreasing digit
+    sequences of a given width, in increasing order, so nothing else is
+    ever generated. Digits below the first digit of lo can't appear in a
+    candidate of the same width, and the walk stops at hi.
+    """
+    for width in range(len(str(lo)), len(str(hi)) + 1):
+        first = int(str(lo)[0]) if width == len(str(lo)) else 1
+        for digits in combinations_with_replacement(range(first, 10), width):
+            number = 0
+            for digit in digits:
+                number = number * 10 + digit
+            if number >= hi:
+                return
+            if number >= lo:
+                yield digits
 
 part1 = 0
 part2 = 0
 
-for number in numbers:
-    repeats, is_decrease = check_rules(number)
-    if len(repeats) > 0 and not is_decrease:
+for digits in non_decreasing(lo, hi):
+    # In a non-decreasing number, equal digits are adjacent: the counts are the run lengths.
+    runs = Counter(digits).values()
+    if max(runs) > 1:
         part1 += 1
-        if 2 in repeats.values():
+        if 2 in runs:
             part2 += 1
 
 print(part1, part2)
@@ -114,61 +114,16 @@ This time, when the TEST diagnostic program runs its input instruction to get th
 
 What is the diagnostic code for system ID 5?
 """
-def intcode_program(instructions, systemID=1):
-    instructions = instructions.split(',')
-    pointer = 0
-    while instructions[pointer] != '99':
-        instruction = instructions[pointer]
-
-        opcode = instruction[-2:]
-        modes = instruction.replace(opcode, '')
-
-        mode1 = modes[-1] if len(modes) > 0 else '0'
-        mode2 = modes[-2] if len(modes) > 1 else '0'
-        mode3 = modes[-3] if len(modes) > 2 else '0'
-        
-        value1 = pointer + 1 if mode1 == '1' else int(instructions[pointer + 1])
-        value2 = pointer + 2 if mode2 == '1' else int(instructions[pointer + 2])
-        value3 = pointer + 3 if mode3 == '1' else int(instructions[pointer + 3])
-
-        if int(opcode) == 1:
-            instructions[value3] = str(int(instructions[value1]) + int(instructions[value2]))
-            pointer += 4
-        elif int(opcode) == 2:
-            instructions[value3] = str(int(instructions[value1]) * int(instructions[value2]))
-            pointer += 4
-        elif int(opcode) == 3:
-            instructions[value1] = str(systemID)
-            pointer += 2
-        elif int(opcode) == 4:
-            if int(instructions[value1]) > 0:
-                print(instructions[value1])
-            pointer += 2
-        elif int(opcode) == 5:
-            if int(instructions[value1]) != 0:
-                pointer = int(instructions[value2])
-            else:
-                pointer += 3
-        elif int(opcode) == 6:
-            if int(instructions[value1]) == 0:
-                pointer = int(instructions[value2])
-            else:
-                pointer += 3
-        elif int(opcode) == 7:
-            if int(instructions[value1]) < int(instructions[value2]):
-                instructions[value3] = '1'
-            else:
-                instructions[value3] = '0'
-            pointer += 4
-        elif int(opcode) == 8:
-            if instructions[value1] == instructions[value2]:
-                instructions[value3] = '1'
-            else:
-                instructions[value3] = '0'
-            pointer += 4
-    return instructions
+from intcode import VM, parse
+
+def intcode_program(program, systemID=1):
+    vm = VM(program, systemID, memory="int64")
+    for value in vm.stream():
+        if value > 0:
+            print(value)
+    return vm.mem
 
 with open('input/day5.txt') as file:
-    instructions = file.read()
-    intcode_program(instructions)
-    intcode_program(instructions, systemID=5)
+    program = parse(file.read())
+    intcode_program(program)
+    intcode_program(program, systemID=5)
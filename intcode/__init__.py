@@ -0,0 +1,7 @@
+from .opcodes import IntcodeError, decode
+from .vm import VM, Snapshot, load, parse
+from .pipeline import Pipeline
+from .scheduler import Scheduler
+from .profiler import Profiler
+from .sweep import Grid, MemoryEquals, sweep
+from .symbolic import Poly, SymbolicBranch, SymbolicVM, solve
@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .vm import VM
+
+# Searches over fewer phases than this finish inline in well under a second
+# (8 phases, 40320 orderings: ~50ms), which a process pool can't pay back.
+PARALLEL_PHASES = 9
+
+
+def phased_amplifiers(program, phases):
+    """Run the shared prefix once, then fork one amplifier per phase setting,
+    parked on the instruction that reads its first input signal."""
+    amplifier = VM(program)
+    amplifier.run()
+    phased = {}
+    for phase in phases:
+        phased[phase] = amplifier.fork(phase)
+        phased[phase].run()
+    return {phase: vm.snapshot() for phase, vm in phased.items()}
+
+
+class AmplifierChain:
+    """Searches phase orderings of a series of identical amplifiers.
+
+    Orderings are walked as a prefix trie. Every ordering that starts with
+    the same phases shares that part of the walk, and each amplifier run is
+    memoised on (phase, input signal). The depth is left out of the key: all
+    amplifiers run the same program, so the output doesn't depend on where
+    the amplifier sits in the chain.
+    """
+
+    def __init__(self, program, phases):
+        self.phases = tuple(phases)
+        self.phased = phased_amplifiers(program, self.phases)
+        self.memo = {}
+
+    def amplify(self, phase, signal):
+        key = (phase, signal)
+        if key not in self.memo:
+            self.memo[key] = self.phased[phase].fork(signal).next_output()
+        return self.memo[key]
+
+    def best(self, remaining=None, signal=0):
+        """Highest final signal reachable from `signal` using the `remaining` phases,
+        together with the ordering that reaches it."""
+        if remaining is None:
+            remaining = self.phases
+        if not remaining:
+            return signal, ()
+        top = None
+        for i, phase in enumerate(remaining):
+            output, order = self.best(remaining[:i] + remaining[i + 1:], self.amplify(phase, signal))
+            if top is None or output > top[0]:
+                top = output, (phase,) + order
+        return top
+
+
+_worker = {}
+
+
+def _init_worker(program, phases):
+    _worker['chain'] = AmplifierChain(program, phases)
+
+
+def _best_subtree(prefix):
+    chain = _worker['chain']
+    signal = 0
+    for phase in prefix:
+        signal = chain.amplify(phase, signal)
+    remaining = tuple(phase for phase in chain.phases if phase not in prefix)
+    output, order = chain.best(remaining, signal)
+    return output, prefix + order
+
+
+def search(program, phases, workers=None):
+    """Best (signal, ordering) over all orderings of `phases` for a chain without feedback.
+
+    For chains of at least PARALLEL_PHASES amplifiers, the first two levels
+    of the trie are handed out as separate tasks to a pool of worker
+    processes, each with its own memo. Shorter chains, and machines with a
+    single CPU, are searched inline.
+    """
+    phases = tuple(phases)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(phases) < PARALLEL_PHASES:
+        return AmplifierChain(program, phases).best()
+
+    prefixes = [(a, b) for a in phases for b in phases if a != b]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(list(program), phases)) as pool:
+        return max(pool.map(_best_subtree, prefixes), key=lambda result: result[0])
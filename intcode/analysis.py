@@ -0,0 +1,246 @@
+import hashlib
+import json
+from collections import namedtuple
+
+from .opcodes import (
+    ADD, EQUALS, HALT, IMMEDIATE, IntcodeError, JUMP_FALSE, JUMP_TRUE, LESS_THAN,
+    MUL, NAMES, OPS, POSITION, RELATIVE, WRITE, decode,
+)
+
+BRANCHES = (JUMP_TRUE, JUMP_FALSE)
+FUSE_FIRST = (ADD, MUL, LESS_THAN, EQUALS)
+
+
+class Instruction(namedtuple('Instruction', 'addr op modes params')):
+    @property
+    def length(self):
+        return 1 + len(self.params)
+
+    @property
+    def next(self):
+        return self.addr + self.length
+
+    def operand(self, i):
+        mode, param = self.modes[i], self.params[i]
+        if mode == IMMEDIATE:
+            return str(param)
+        if mode == RELATIVE:
+            return f"[rb{param:+d}]"
+        return f"[{param}]"
+
+    def static_target(self):
+        """Jump target if it is an immediate, else None."""
+        if self.op in BRANCHES and self.modes[1] == IMMEDIATE:
+            return self.params[1]
+        return None
+
+    def falls_through(self):
+        if self.op == HALT:
+            return False
+        if self.op in BRANCHES and self.modes[0] == IMMEDIATE:
+            return (self.params[0] != 0) != (self.op == JUMP_TRUE)
+        return True
+
+    def writes(self):
+        """(mode, param) of the write operand, or None."""
+        for mode, param, kind in zip(self.modes, self.params, OPS[self.op]):
+            if kind == WRITE:
+                return mode, param
+        return None
+
+    def __str__(self):
+        operands = ', '.join(self.operand(i) for i in range(len(self.params)))
+        return f"{self.addr:6}: {NAMES[self.op]:<18} {operands}".rstrip()
+
+
+class BasicBlock:
+    def __init__(self, start):
+        self.start = start
+        self.instructions = []
+        self.successors = []
+
+    @property
+    def end(self):
+        return self.instructions[-1].next if self.instructions else self.start
+
+    def __repr__(self):
+        return f"BasicBlock({self.start}..{self.end}, successors={self.successors})"
+
+
+class CFG:
+    """Basic blocks and control flow recovered from an Intcode program.
+
+    Instructions are found by following fall-through and immediate jump
+    targets from `entries`. A jump whose target comes from memory is
+    recorded as a successor of None. Code that is only reached that way is
+    not in the graph. Position-mode writes that land on a recovered
+    instruction are listed in `code_writes`. Relative-mode writes can't be
+    resolved statically and are listed in `dynamic_writes`.
+    """
+
+    def __init__(self, code, entries=(0,)):
+        self.code = list(code)
+        self.instructions = {}
+        self.blocks = {}
+        self.code_writes = []
+        self.dynamic_writes = []
+        self.build(entries)
+
+    @property
+    def self_modifying(self):
+        return bool(self.code_writes)
+
+    def decode_at(self, addr):
+        if not 0 <= addr < len(self.code):
+            return None
+        try:
+            op, modes = decode(self.code[addr])
+        except IntcodeError:
+            return None
+        params = tuple(self.code[addr + 1:addr + 1 + len(modes)])
+        if len(params) < len(modes):
+            return None
+        return Instruction(addr, op, modes, params)
+
+    def build(self, entries):
+        leaders = set(entries)
+        work = list(entries)
+        while work:
+            addr = work.pop()
+            while addr not in self.instructions:
+                instr = self.decode_at(addr)
+                if instr is None:
+                    break
+                self.instructions[addr] = instr
+                target = instr.static_target()
+                if target is not None:
+                    leaders.add(target)
+                    work.append(target)
+                if instr.op in BRANCHES or instr.op == HALT:
+                    leaders.add(instr.next)
+                if not instr.falls_through():
+                    break
+                addr = instr.next
+
+        block = None
+        for addr in sorted(self.instructions):
+            instr = self.instructions[addr]
+            if block is None or addr in leaders or addr != block.end:
+                block = self.blocks[addr] = BasicBlock(addr)
+            block.instructions.append(instr)
+            if instr.op in BRANCHES or instr.op == HALT:
+                block.successors = self.successors(instr)
+                block = None
+
+        for block in self.blocks.values():
+            if not block.successors and block.instructions[-1].op != HALT:
+                block.successors = [block.end] if block.end in self.blocks else [None]
+        self.find_writes()
+
+    def find_writes(self):
+        words = self.instruction_words()
+        for instr in self.instructions.values():
+            write = instr.writes()
+            if write is None:
+                continue
+            mode, param = write
+            if mode == POSITION and param in words:
+                self.code_writes.append((instr.addr, param))
+            elif mode == RELATIVE:
+                self.dynamic_writes.append(instr.addr)
+
+    def successors(self, instr):
+        if instr.op == HALT:
+            return []
+        targets = []
+        if instr.falls_through():
+            targets.append(instr.next)
+        if instr.op in BRANCHES:
+            targets.append(instr.static_target())
+        return targets
+
+    def instruction_words(self):
+        return {addr for instr in self.instructions.values()
+                for addr in range(instr.addr, instr.next)}
+
+    def fusions(self):
+        """Addresses where an arithmetic/compare is directly followed by a branch in the same block."""
+        pairs = set()
+        for block in self.blocks.values():
+            for first, second in zip(block.instructions, block.instructions[1:]):
+                if first.op in FUSE_FIRST and second.op in BRANCHES:
+                    pairs.add(first.addr)
+        return pairs
+
+    def format(self):
+        lines = []
+        for start in sorted(self.blocks):
+            block = self.blocks[start]
+            lines.append(f"block_{start}:")
+            for instr in block.instructions:
+                writers = [str(addr) for addr, target in self.code_writes if instr.addr <= target < instr.next]
+                note = f"  ; overwritten by {', '.join(writers)}" if writers else ''
+                lines.append(f"{instr}{note}")
+            successors = ', '.join('?' if s is None else f"block_{s}" for s in block.successors)
+            lines.append(f"        -> {successors or 'halt'}")
+        return '\n'.join(lines)
+
+    def to_json(self):
+        return {
+            'digest': digest(self.code),
+            'blocks': {str(start): [instr.addr for instr in block.instructions]
+                       for start, block in self.blocks.items()},
+            'successors': {str(start): block.successors for start, block in self.blocks.items()},
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_json(), f)
+
+    @classmethod
+    def load(cls, path, code):
+        """Rebuild a saved CFG for `code` without re-running the traversal."""
+        with open(path) as f:
+            data = json.load(f)
+        if data['digest'] != digest(code):
+            raise IntcodeError(f"{path} was saved for a different program")
+        cfg = cls.__new__(cls)
+        cfg.code = list(code)
+        cfg.instructions = {}
+        cfg.blocks = {}
+        cfg.code_writes = []
+        cfg.dynamic_writes = []
+        for start, addrs in data['blocks'].items():
+            block = cfg.blocks[int(start)] = BasicBlock(int(start))
+            block.instructions = [cfg.decode_at(addr) for addr in addrs]
+            block.successors = data['successors'][start]
+            cfg.instructions.update((instr.addr, instr) for instr in block.instructions)
+        cfg.find_writes()
+        return cfg
+
+
+def digest(code):
+    return hashlib.sha256(','.join(map(str, code)).encode()).hexdigest()
+
+
+_CACHE = {}
+
+
+def cfg_for(code):
+    """CFG for `code`, built once per distinct program per process."""
+    key = digest(code)
+    if key not in _CACHE:
+        _CACHE[key] = CFG(code)
+    return _CACHE[key]
+
+
+def disassemble(code, entries=(0,)):
+    return CFG(code, entries).format()
+
+
+if __name__ == '__main__':
+    import sys
+
+    from .vm import load
+
+    print(disassemble(load(sys.argv[1])))
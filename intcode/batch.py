@@ -0,0 +1,157 @@
+"""Lockstep interpreter for many copies of one program. Needs NumPy."""
+import numpy as np
+
+from .opcodes import (
+    ADD, ADD_RELATIVE_BASE, EQUALS, HALT, IMMEDIATE, IN, JUMP_FALSE, JUMP_TRUE,
+    LESS_THAN, MUL, OPS, OUT, RELATIVE, READ, IntcodeError, decode,
+)
+from .vm import VM
+
+# Products at or above this magnitude may not fit int64; those lanes finish on the scalar VM.
+MUL_LIMIT = float(2 ** 62)
+
+
+class BatchVM:
+    """Runs K instances of the same program as rows of a (K, mem_size) int64 array.
+
+    Each step takes the lanes that share an instruction pointer and
+    instruction word, and executes that instruction for all of them with
+    array operations. Lanes that diverge are split into separate groups.
+    A lane is moved to a scalar `VM` when it touches memory outside the
+    array, when an add or multiply could overflow int64, or when it takes
+    a jump to a negative address, which the scalar VM reports. That VM then
+    finishes the run with Python ints.
+    """
+
+    def __init__(self, code, inputs, mem_size=None):
+        code = list(code)
+        lanes = len(inputs)
+        self.mem_size = mem_size or len(code) + 1024
+        self.mem = np.zeros((lanes, self.mem_size), dtype=np.int64)
+        self.mem[:, :len(code)] = code
+        self.ip = np.zeros(lanes, dtype=np.int64)
+        self.relative_base = np.zeros(lanes, dtype=np.int64)
+        self.input_count = np.array([len(values) for values in inputs], dtype=np.int64)
+        self.input_pos = np.zeros(lanes, dtype=np.int64)
+        self.inputs = np.zeros((lanes, max(1, self.input_count.max(initial=0))), dtype=np.int64)
+        for lane, values in enumerate(inputs):
+            self.inputs[lane, :len(values)] = values
+        self.running = np.ones(lanes, dtype=bool)
+        self.halted = np.zeros(lanes, dtype=bool)
+        self.outputs = [[] for _ in range(lanes)]
+        self.scalar = {}
+        self.instructions = 0
+
+    def __len__(self):
+        return len(self.ip)
+
+    def poke(self, addr, values):
+        """Write one value per lane at `addr`."""
+        self.mem[:, addr] = values
+
+    def memory(self, lane):
+        if lane in self.scalar:
+            return self.scalar[lane].mem
+        return self.mem[lane].tolist()
+
+    def run(self):
+        while True:
+            lanes = np.flatnonzero(self.running)
+            if not lanes.size:
+                break
+            ips = self.ip[lanes]
+            if ips.min() == ips.max():
+                self.step(int(ips[0]), lanes)
+                continue
+            unique, inverse = np.unique(ips, return_inverse=True)
+            for i, ip in enumerate(unique):
+                self.step(int(ip), lanes[inverse == i])
+
+        for lane, vm in self.scalar.items():
+            vm.run()
+            self.outputs[lane].extend(vm.outputs)
+            self.halted[lane] = vm.halted
+        return self
+
+    def to_scalar(self, lanes):
+        """Hand `lanes` over to scalar VMs, resuming at their current instruction."""
+        for lane in lanes.tolist():
+            vm = VM(self.mem[lane].tolist())
+            vm.ip = int(self.ip[lane])
+            vm.relative_base = int(self.relative_base[lane])
+            vm.feed(self.inputs[lane, self.input_pos[lane]:self.input_count[lane]].tolist())
+            self.scalar[lane] = vm
+        self.running[lanes] = False
+
+    def step(self, ip, lanes):
+        if ip < 0:
+            raise IntcodeError(f"Jump to negative address: {ip}")
+        if ip + 4 > self.mem_size:
+            self.to_scalar(lanes)
+            return
+        instr = self.mem[lanes, ip]
+        if (instr != instr[0]).any():
+            for word in np.unique(instr):
+                self.step(ip, lanes[instr == word])
+            return
+
+        op, modes = decode(int(instr[0]))
+        words = self.mem[lanes, ip + 1:ip + 1 + len(modes)]
+        args = []
+        ok = np.ones(len(lanes), dtype=bool)
+        for i, (mode, kind) in enumerate(zip(modes, OPS[op])):
+            if mode == IMMEDIATE:
+                args.append(words[:, i])
+                continue
+            addr = words[:, i] + self.relative_base[lanes] if mode == RELATIVE else words[:, i]
+            ok &= (addr >= 0) & (addr < self.mem_size)
+            if kind == READ:
+                addr = self.mem[lanes, np.where(ok, addr, 0)]
+            args.append(addr)
+
+        if op == ADD:
+            result = args[0] + args[1]
+            ok &= ((args[0] ^ result) & (args[1] ^ result)) >= 0
+        elif op == MUL:
+            ok &= np.abs(args[0].astype(float) * args[1].astype(float)) < MUL_LIMIT
+            result = args[0] * args[1]
+        elif op in (JUMP_TRUE, JUMP_FALSE):
+            # NumPy would wrap a negative ip around to the end of the row.
+            taken = (args[0] != 0) if op == JUMP_TRUE else (args[0] == 0)
+            ok &= ~taken | (args[1] >= 0)
+        if not ok.all():
+            self.to_scalar(lanes[~ok])
+            lanes = lanes[ok]
+            args = [arg[ok] for arg in args]
+            if op in (ADD, MUL):
+                result = result[ok]
+            elif op in (JUMP_TRUE, JUMP_FALSE):
+                taken = taken[ok]
+        self.instructions += len(lanes)
+
+        next_ip = ip + 1 + len(modes)
+        if op in (ADD, MUL):
+            self.mem[lanes, args[2]] = result
+        elif op == LESS_THAN:
+            self.mem[lanes, args[2]] = args[0] < args[1]
+        elif op == EQUALS:
+            self.mem[lanes, args[2]] = args[0] == args[1]
+        elif op in (JUMP_TRUE, JUMP_FALSE):
+            self.ip[lanes] = np.where(taken, args[1], next_ip)
+            return
+        elif op == ADD_RELATIVE_BASE:
+            self.relative_base[lanes] += args[0]
+        elif op == IN:
+            has_input = self.input_pos[lanes] < self.input_count[lanes]
+            self.running[lanes[~has_input]] = False
+            lanes, addr = lanes[has_input], args[0][has_input]
+            self.mem[lanes, addr] = self.inputs[lanes, self.input_pos[lanes]]
+            self.input_pos[lanes] += 1
+        elif op == OUT:
+            for lane, value in zip(lanes.tolist(), args[0].tolist()):
+                self.outputs[lane].append(value)
+        elif op == HALT:
+            self.halted[lanes] = True
+            self.running[lanes] = False
+            return
+        self.ip[lanes] = next_ip
@@ -0,0 +1,226 @@
+"""Rough timings for the Intcode engines: python -m intcode.bench"""
+import time
+
+from .peephole import optimize
+from .pipeline import Pipeline
+from .profiler import Profiler
+from .scheduler import Scheduler
+from .vm import VM, load
+
+# Reads a value, adds one, writes it back out and loops until it reaches N.
+RELAY = [3, 100, 1001, 100, 1, 100, 4, 100, 1007, 100, None, 101, 1005, 101, 0, 99]
+
+# Counts [20] down from N while adding 3 to [21] each time, then outputs [21].
+COUNTDOWN = [1101, 0, None, 20, 1001, 20, -1, 20, 1001, 21, 3, 21, 1005, 20, 4, 4, 21, 99]
+
+# Counts [100] down from N while adding [102] to [101] and incrementing [102].
+# The sum is quadratic in the iteration count, so there is no closed form.
+TRIANGLE = [1101, 0, None, 100, 1, 101, 102, 101, 1001, 102, 1, 102, 1001, 100, -1, 100, 1005, 100, 4, 4, 101, 99]
+
+
+def timed(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_backends(path='input/day9.txt', inp=2):
+    code = load(path)
+    baseline = None
+    for backend in ("interpreter", "fused", "compiled"):
+        elapsed, result = timed(lambda: VM(code, inp, backend=backend).run())
+        baseline = baseline or elapsed
+        print(f"{path} [{backend:>11}] {elapsed * 1000:8.2f}ms  x{baseline / elapsed:.2f}  -> {result}")
+
+
+def relay_ring(hops, size=5):
+    code = [hops if word is None else word for word in RELAY]
+    vms = [VM(code) for _ in range(size)]
+    vms[0].feed(0)
+    return vms
+
+
+class PollingComputer:
+    """The day7 amplifier before Pipeline existed, kept as a baseline.
+
+    Opcodes are decoded from a formatted string on every step, inputs are
+    a list consumed with `pop(0)`, and the driver polls `done` after
+    handing each VM one value.
+    """
+
+    def __init__(self, code):
+        self.idx = 0
+        self.data = list(code)
+        self.done = False
+        self.output = None
+        self.inputs = []
+
+    def param(self, mode, offset):
+        word = self.data[self.idx + offset]
+        return word if mode == "1" else self.data[word]
+
+    def calculate(self, value):
+        self.inputs.append(value)
+        data = self.data
+        while True:
+            instr = f"{data[self.idx]:05}"
+            op = int(instr[3:])
+            if op in (1, 2, 7, 8):
+                a, b = self.param(instr[2], 1), self.param(instr[1], 2)
+                result = {1: a + b, 2: a * b, 7: int(a < b), 8: int(a == b)}[op]
+                data[data[self.idx + 3]] = result
+                self.idx += 4
+            elif op == 3:
+                data[data[self.idx + 1]] = self.inputs.pop(0)
+                self.idx += 2
+            elif op == 4:
+                self.output = self.param(instr[2], 1)
+                self.idx += 2
+                return self.output
+            elif op in (5, 6):
+                a, b = self.param(instr[2], 1), self.param(instr[1], 2)
+                self.idx = b if (a != 0) == (op == 5) else self.idx + 3
+            elif op == 99:
+                self.done = True
+                return self.output
+
+
+def bench_feedback(hops=10 ** 6):
+    def polling():
+        code = [hops if word is None else word for word in RELAY] + [0] * 100
+        computers = [PollingComputer(code) for _ in range(5)]
+        signal = 0
+        while not computers[-1].done:
+            for computer in computers:
+                signal = computer.calculate(signal)
+        return computers[-1].output
+
+    def round_robin():
+        vms = relay_ring(hops)
+        signal = None
+        while not vms[-1].halted:
+            for vm in vms:
+                if signal is not None:
+                    vm.feed(signal)
+                signal = vm.next_output()
+        return vms[-1].last_output
+
+    def scheduled():
+        vms = relay_ring(hops)
+        Pipeline.ring(vms).run()
+        return vms[-1].last_output
+
+    def sliced():
+        vms = relay_ring(hops)
+        Scheduler.ring(vms).run()
+        return vms[-1].last_output
+
+    for name, fn in (("polling", polling), ("round robin", round_robin),
+                     ("pipeline", scheduled), ("scheduler", sliced)):
+        elapsed, result = timed(fn, repeat=1)
+        print(f"feedback ring, {hops} hops [{name:>11}] {elapsed:6.2f}s  "
+              f"{hops / elapsed / 1000:7.1f}k hops/s  -> {result}")
+
+
+def bench_batch(path='input/day5.txt', lanes=2000):
+    try:
+        from .batch import BatchVM
+    except ImportError:
+        print("batch: NumPy not installed, skipped")
+        return
+    code = load(path)
+    inputs = [[1 if lane % 2 else 5] for lane in range(lanes)]
+
+    def scalar():
+        for values in inputs:
+            VM(code, values).run()
+
+    batch_elapsed, batch = timed(lambda: BatchVM(code, inputs).run(), repeat=1)
+    scalar_elapsed, _ = timed(scalar, repeat=1)
+    for name, elapsed in (("scalar VMs", scalar_elapsed), ("BatchVM", batch_elapsed)):
+        print(f"{path} x{lanes} lanes [{name:>10}] {elapsed * 1000:8.2f}ms  "
+              f"{batch.instructions / elapsed / 1e6:6.2f}M instructions/s")
+
+
+def bench_loops(n=10 ** 6, m=2 * 10 ** 5):
+    for name, program, trips in (("countdown", COUNTDOWN, n), ("triangle", TRIANGLE, m)):
+        code = [trips if word is None else word for word in program]
+        for backend in ("interpreter", "compiled"):
+            vm = VM(code, backend=backend)
+            elapsed, result = timed(vm.run, repeat=1)
+            print(f"{name} {trips} [{backend:>11}] {elapsed * 1000:8.2f}ms  "
+                  f"{vm.skipped} instructions skipped  -> {result}")
+
+
+# Echoes two inputs and halts.
+ECHO_TWICE = [3, 20, 4, 20, 3, 21, 4, 21, 99]
+
+
+def bench_parallel_resume(vms=4):
+    """Check: VMs brought back from a parallel Scheduler run resume like the interpreter."""
+    finals = {}
+    for backend in ("interpreter", "compiled"):
+        group = [VM(ECHO_TWICE, [n], backend=backend) for n in range(vms)]
+        elapsed, _ = timed(lambda: Scheduler(group).run(workers=2), repeat=1)
+        for vm in group:
+            assert vm.compiler is None or vm.compiler.vm is vm, "compiler bound to a worker's copy"
+            vm.feed(9)
+            vm.run()
+        finals[backend] = [(vm.ip, vm.halted, list(vm.outputs)) for vm in group]
+        print(f"parallel resume x{vms} [{backend:>11}] {elapsed * 1000:8.2f}ms  -> {finals[backend][0]}")
+    assert finals["compiled"] == finals["interpreter"], finals
+
+
+PEEPHOLE_RUNS = [
+    ('input/day5.txt', [[1], [5]]),
+    ('input/day7.txt', [[phase, 0] for phase in range(5)]),
+    ('input/day9.txt', [[1], [2]]),
+]
+
+# Counts [100] down from 50 through a jump-to-jump that threading removes.
+THREADED = [1101, 0, 50, 100, 1001, 100, -1, 100, 1005, 100, 14, 4, 100, 99, 1105, 1, 4]
+
+# (name, program, inputs, expected). The two self-patching programs rewrite
+# an operand and an opcode of their own code, so the optimiser has to leave
+# them unchanged.
+PEEPHOLE_PROGRAMS = [
+    ('threaded loop', THREADED, [[]], 'faster'),
+    ('self-patching output',
+     [7, 16, 16, 5, 4, 18, 7, 18, 11, 11, 99, 104, 5, 106, 6, 11, 1102, 4, 5, 5, 23, 27, 14, 12, 18, 29],
+     [[23, 14, 6, 27, 27, 17]], 'unchanged'),
+    ('self-patching branch',
+     [1, 13, 18, 1, 3, 6, 3, 10, 99, 104, 23, 3, 1, 99, 4, 18, 99, 1106, 22, 10, 99, 25, 6, 11, 2, 25, 0],
+     [[6, 21, -1, 0, 6, 8]], 'unchanged'),
+]
+
+
+def bench_peephole(runs=PEEPHOLE_RUNS, programs=PEEPHOLE_PROGRAMS):
+    """Differential check: optimised programs must give the same outputs in no more instructions."""
+    def profiled(code, inp):
+        vm = VM(code, inp)
+        profiler = Profiler.attach(vm)
+        vm.run()
+        return list(vm.outputs), vm.halted, profiler.report()['instructions']
+
+    cases = [(path, load(path), inputs, None) for path, inputs in runs] + programs
+    for name, code, inputs, expected in cases:
+        optimized = optimize(code)
+        assert expected != 'unchanged' or optimized == code, name
+        for inp in inputs:
+            *result, before = profiled(code, inp)
+            *optimized_result, after = profiled(optimized, inp)
+            print(f"{name} {inp} [  peephole] {before:8} -> {after:8} instructions")
+            assert optimized_result == result, (name, inp, result, optimized_result)
+            assert after < before if expected == 'faster' else after <= before, (name, inp, before, after)
+
+if __name__ == '__main__':
+    bench_backends()
+    bench_feedback()
+    bench_batch()
+    bench_loops()
+    bench_parallel_resume()
+    bench_peephole()
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import tempfile
+from array import array
+from collections import namedtuple
+
+from .memory import PAGE_SIZE
+from .vm import VM
+
+# Part of every cache key. Bump it whenever a change to the engine could
+# change what a program outputs, so stale results are never served.
+ENGINE_VERSION = 1
+
+Result = namedtuple('Result', 'outputs halted memory_digest')
+
+
+def _hash_words(h, values):
+    try:
+        h.update(array('q', values))
+    except OverflowError:
+        h.update(','.join(map(str, values)).encode())
+
+
+def memory_digest(vm):
+    """Hash of a VM's memory contents, independent of how they are paged."""
+    h = hashlib.sha256()
+    dense = vm.memory.dense
+    pages = [(index, dense[index * PAGE_SIZE:(index + 1) * PAGE_SIZE])
+             for index in range(len(dense) // PAGE_SIZE)]
+    pages.extend(sorted(vm.memory.pages.items()))
+    for index, page in pages:
+        if any(page):
+            h.update(f"{index}:".encode())
+            _hash_words(h, page)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of Intcode run results, keyed on (program, inputs, engine version).
+
+    Each entry is a small JSON file named after its key. Entries are written
+    to a temporary file and renamed into place, so readers in other
+    processes see either the whole entry or none of it, and no locking is
+    needed. A hit touches the file's mtime. When the directory grows past
+    `max_bytes`, the least recently used entries are deleted until it
+    fits again. An entry that another process evicts mid-read is treated
+    as a miss.
+    """
+
+    def __init__(self, path, max_bytes=64 << 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, code, inputs=()):
+        h = hashlib.sha256(f"intcode {ENGINE_VERSION} {len(code)}|".encode())
+        _hash_words(h, code)
+        _hash_words(h, inputs)
+        return h.hexdigest()
+
+    def entry(self, key):
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, code, inputs=()):
+        path = self.entry(self.key(code, inputs))
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return Result(tuple(data['outputs']), data['halted'], data['memory_digest'])
+
+    def put(self, code, inputs, result):
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(result._asdict(), f)
+        os.replace(tmp, self.entry(self.key(code, inputs)))
+        self.evict()
+
+    def run(self, code, inputs=(), backend="interpreter"):
+        """Result of running `code` on `inputs`, from the cache if it has been run before."""
+        inputs = list(inputs)
+        result = self.get(code, inputs)
+        if result is None:
+            vm = VM(code, inputs, backend=backend)
+            vm.run()
+            result = Result(tuple(vm.outputs), vm.halted, memory_digest(vm))
+            self.put(code, inputs, result)
+        return result
+
+    def evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
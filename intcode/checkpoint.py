@@ -0,0 +1,188 @@
+"""On-disk VM checkpoints.
+
+A checkpoint file is an append-only log of int64 words:
+
+    header | code | page | page | ... | state | page | ... | state
+
+The header holds the offset of the newest state record, which lists ip,
+relative base, the pending I/O queues and an (index, offset) entry for
+every memory page. Saving again to the same file appends only the pages
+that changed since the last save plus a new state record, then rewrites
+the header. Data that has been written is never overwritten in place, so
+a restored VM can keep reading its pages straight out of a read-only
+mapping of the file. Once less than half of the file is live, the next
+save rewrites it compactly into a new file that replaces the old one.
+
+A file should have one writer at a time. Values outside int64 can't be
+saved.
+"""
+import mmap
+import os
+import struct
+from array import array
+
+from .memory import PAGE_SIZE, PagedMemory
+from .opcodes import IntcodeError
+from .vm import VM
+
+MAGIC = b"INTCODE\x01"
+HEADER = struct.Struct("<8sqq")  # magic, state offset, live bytes
+STATE = struct.Struct("<11q")  # ip, relative base, halted, has last output, last output,
+                               # int64 memory, code offset, code words, inputs, outputs, pages
+PAGE_BYTES = 8 * PAGE_SIZE
+
+
+class CheckpointLog:
+    """What a VM last wrote to a checkpoint file, used to work out what changed since."""
+
+    def __init__(self, path, code_offset, offsets, pages, live):
+        self.path = path
+        self.code_offset = code_offset
+        self.offsets = offsets
+        self.pages = pages
+        self.live = live
+        self.stat = _stat(path)
+
+
+def _stat(path):
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size
+
+
+def _words(values, what):
+    try:
+        return array('q', values)
+    except OverflowError:
+        raise IntcodeError(f"Cannot checkpoint {what}: value outside int64 range") from None
+
+
+def _dense_pages(memory):
+    dense = memory.dense
+    data = (dense if isinstance(dense, array) else _words(dense, "memory")).tobytes()
+    for index in range(len(dense) // PAGE_SIZE):
+        yield index, data[index * PAGE_BYTES:(index + 1) * PAGE_BYTES]
+
+
+def _state(vm, code_offset, offsets):
+    if vm.sources:
+        raise IntcodeError("Cannot checkpoint a VM with pending input iterables")
+    fields = (
+        vm.ip, vm.relative_base, vm.halted, vm.last_output is not None, vm.last_output or 0,
+        isinstance(vm.memory.dense, array), code_offset, len(vm.code),
+        len(vm.inputs), len(vm.outputs), len(offsets),
+    )
+    table = [word for index in sorted(offsets) for word in (index, offsets[index])]
+    return (_words(fields, "registers").tobytes() + _words(vm.inputs, "inputs").tobytes()
+            + _words(vm.outputs, "outputs").tobytes() + array('q', table).tobytes())
+
+
+def save(vm, path):
+    """Write `vm` to `path`, incrementally if `path` is the file it last saved to."""
+    log = vm.checkpoint_log
+    if log is None or log.path != path or not os.path.exists(path) or _stat(path) != log.stat \
+            or os.path.getsize(path) > 2 * log.live:
+        log = _save_full(vm, path)
+    else:
+        log = _save_incremental(vm, log)
+    vm.memory.owned = set()
+    return log
+
+
+def _save_full(vm, path):
+    tmp = f"{path}.tmp"
+    offsets = {}
+    pages = {}
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+        code_offset = f.tell()
+        f.write(_words(vm.code, "code").tobytes())
+        for index, data in _dense_pages(vm.memory):
+            offsets[index] = f.tell()
+            f.write(data)
+        for index, page in vm.memory.pages.items():
+            offsets[index] = f.tell()
+            pages[index] = page
+            f.write(_words(page, "memory").tobytes())
+        state_offset = f.tell()
+        f.write(_state(vm, code_offset, offsets))
+        live = f.tell()
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, state_offset, live))
+    os.replace(tmp, path)
+    return CheckpointLog(path, code_offset, offsets, pages, live)
+
+
+def _save_incremental(vm, log):
+    offsets = dict(log.offsets)
+    pages = dict(log.pages)
+    live = HEADER.size + 8 * len(vm.code)
+    with open(log.path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            f.seek(0, os.SEEK_END)
+            for index, data in _dense_pages(vm.memory):
+                offset = offsets.get(index)
+                if offset is None or mm[offset:offset + PAGE_BYTES] != data:
+                    offsets[index] = f.tell()
+                    f.write(data)
+                pages.pop(index, None)
+        for index, page in vm.memory.pages.items():
+            if pages.get(index) is not page:
+                offsets[index] = f.tell()
+                pages[index] = page
+                f.write(_words(page, "memory").tobytes())
+        state = _state(vm, log.code_offset, offsets)
+        state_offset = f.tell()
+        f.write(state)
+        live += len(offsets) * PAGE_BYTES + len(state)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, state_offset, live))
+    return CheckpointLog(log.path, log.code_offset, offsets, pages, live)
+
+
+def restore(path, backend="interpreter", cfg=None):
+    """A VM resumed from the newest state in `path`.
+
+    Sparse pages stay read-only views into the mapped file until the
+    program first writes to them. Only the dense segment is copied out.
+    """
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, state_offset, live = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise IntcodeError(f"{path} is not an Intcode checkpoint")
+    (ip, relative_base, halted, has_last_output, last_output, int64,
+     code_offset, code_words, input_count, output_count, page_count) = STATE.unpack_from(mm, state_offset)
+    view = memoryview(mm)
+
+    def words(offset, count):
+        return view[offset:offset + 8 * count].cast('q')
+
+    offset = state_offset + STATE.size
+    inputs = words(offset, input_count).tolist()
+    offset += 8 * input_count
+    outputs = words(offset, output_count).tolist()
+    offset += 8 * output_count
+    table = words(offset, 2 * page_count).tolist()
+    offsets = dict(zip(table[::2], table[1::2]))
+
+    memory = PagedMemory.__new__(PagedMemory)
+    dense = array('q')
+    pages = {}
+    for index in sorted(offsets):
+        if index == len(dense) // PAGE_SIZE:
+            dense.frombytes(view[offsets[index]:offsets[index] + PAGE_BYTES])
+        else:
+            pages[index] = words(offsets[index], PAGE_SIZE)
+    memory.dense = dense if int64 else dense.tolist()
+    memory.dense_users = [1]
+    memory.pages = pages
+    memory.owned = set()
+
+    vm = VM.__new__(VM)
+    vm.code = words(code_offset, code_words).tolist()
+    vm.set_backend(backend, cfg)
+    vm.memory = memory
+    vm.reset_state(ip, relative_base, inputs, outputs,
+                   last_output if has_last_output else None, bool(halted))
+    vm.checkpoint_log = CheckpointLog(path, code_offset, offsets, dict(pages), live)
+    return vm
@@ -0,0 +1,297 @@
+from collections import Counter, defaultdict
+
+from .opcodes import (
+    ADD, ADD_RELATIVE_BASE, EQUALS, IMMEDIATE, JUMP_FALSE, JUMP_TRUE, LESS_THAN, MUL,
+    OPS, POSITION, READ, IntcodeError, decode,
+)
+from .analysis import Instruction
+from .loops import CountedLoop
+from .vm import CHECKED_HANDLERS, Halt, NeedInput, Output
+
+# Compiling a block costs about as much as interpreting it a few hundred
+# times, so code is only compiled once it has been entered HOT times, and
+# past REWRITE_LIMIT rewrites a block start is left to the interpreter.
+HOT = 2
+REWRITE_LIMIT = 4
+
+STRAIGHT = {
+    ADD: "{c} = {a} + {b}",
+    MUL: "{c} = {a} * {b}",
+    LESS_THAN: "{c} = 1 if {a} < {b} else 0",
+    EQUALS: "{c} = 1 if {a} == {b} else 0",
+}
+BRANCHES = {
+    JUMP_TRUE: "{a} != 0",
+    JUMP_FALSE: "{a} == 0",
+}
+BRANCH = "return {b} if {taken} else {fall}"
+# A target read from memory is checked, since a negative ip returned from a
+# block would be taken for a slow-path exit.
+COMPUTED_BRANCH = "if {taken}:\n    _t = {b}\n    if _t < 0:\n        raise IndexError\n    return _t\nreturn {fall}"
+# Closing branch of a CountedLoop block: leaving the loop re-arms its
+# closed-form check for the next time the loop is entered.
+LOOP_BRANCH = "if {taken}:\n    return {b}\nloop.armed = True\nreturn {fall}"
+
+
+class Compiler:
+    """Compiles each basic block of a VM's program into a Python function on first entry.
+
+    Operand words are read once at compile time, so parameter modes and
+    position-mode addresses become constants in the generated source. A block
+    returns the next ip, or `~ip` to have the instruction at `ip` run through
+    `VM.slow_step` (I/O, halts, accesses outside the dense segment, int64
+    overflow).
+
+    `blocks` is a cache of decoded code indexed by address. Every word covered
+    by a compiled block is flagged in `watch`, and a write to a flagged word
+    drops just the blocks that cover it, which are recompiled from the new
+    memory the next time they are entered. Compiled code never writes to a
+    flagged word itself: a position-mode write into code ends the block
+    before that instruction so it goes through `VM.store`, relative-mode
+    writes check `watch` at run time, and a block that already writes to
+    some address is recompiled when that address becomes code. A block
+    start that keeps getting rewritten stops being compiled and is
+    interpreted one instruction at a time instead, as are instructions that
+    can't start a block (I/O, halts, writes into code).
+
+    A block that loops back to its own start is checked once per entry into
+    the loop for a closed form (`loops.CountedLoop`); when there is one, the
+    remaining iterations are skipped. When there isn't, the check is
+    disarmed until control leaves the loop, so the back edge costs nothing
+    extra.
+
+    Given a CFG, the compiler emits superinstructions instead of whole
+    blocks. Each unit is one instruction, or an arithmetic/compare fused with
+    the branch that follows it wherever `cfg.fusions()` found such a pair.
+    """
+
+    def __init__(self, vm, cfg=None):
+        self.vm = vm
+        self.fusions = None if cfg is None else cfg.fusions()
+        self.watch = vm.watch = bytearray(len(vm.mem))
+        self.blocks = BlockTable(self)
+        self.ranges = {}
+        self.covering = defaultdict(set)
+        self.writers = defaultdict(set)
+        self.rewrites = Counter()
+
+    def execute(self):
+        vm = self.vm
+        mem = vm.mem
+        watch = self.watch
+        blocks = self.blocks
+        ip = vm.ip
+        while not vm.halted:
+            try:
+                while True:
+                    ip = blocks[ip](vm, mem)
+                    if ip < 0:
+                        ip = ~ip
+                        ip = vm.slow_step(ip)
+                        mem = vm.mem
+                        if len(watch) != len(mem):
+                            self.grow_watch()
+            except Output:
+                ip += 2
+                break
+            except NeedInput:
+                if not vm.pull():
+                    break
+            except Halt:
+                vm.halted = True
+        vm.ip = ip
+
+    def run_slice(self, budget):
+        """Run blocks until `budget` instructions have run, and return how many did.
+
+        Each block counts as all of its instructions, so a slice can overrun
+        the budget by up to one block.
+        """
+        vm = self.vm
+        mem = vm.mem
+        watch = self.watch
+        blocks = self.blocks
+        ip = vm.ip
+        ran = 0
+        while not vm.halted and ran < budget:
+            try:
+                while ran < budget:
+                    block = blocks[ip]
+                    ip = block(vm, mem)
+                    ran += block.size
+                    if ip < 0:
+                        ip = ~ip
+                        ip = vm.slow_step(ip)
+                        ran += 1
+                        mem = vm.mem
+                        if len(watch) != len(mem):
+                            self.grow_watch()
+            except NeedInput:
+                if not vm.pull():
+                    break
+            except Halt:
+                vm.halted = True
+                ran += 1
+        vm.ip = ip
+        return ran
+
+    def grow_watch(self):
+        self.watch.extend(bytes(len(self.vm.mem) - len(self.watch)))
+
+    def invalidate(self, addr):
+        """The program wrote to `addr`, which compiled code was decoded from."""
+        for start in list(self.covering.get(addr, ())):
+            self.rewrites[start] += 1
+            self.drop(start)
+
+    def drop(self, start):
+        self.blocks.pop(start, None)
+        end, writes = self.ranges.pop(start)
+        for addr in range(start, end):
+            covering = self.covering[addr]
+            covering.discard(start)
+            if not covering:
+                del self.covering[addr]
+                self.watch[addr] = 0
+        for addr in writes:
+            self.writers[addr].discard(start)
+
+    def compile(self, start):
+        if self.rewrites[start] >= REWRITE_LIMIT:
+            return interpreted(start)
+        mem = self.vm.mem
+        self.grow_watch()
+        ip = start
+        lines = []
+        writes = []
+        instructions = []
+        exit_line = None
+        branch = None
+        uses_rb = False
+        limit = None
+        if self.fusions is not None:
+            limit = 2 if start in self.fusions else 1
+
+        while ip < len(self.watch) and exit_line is None and limit != 0:
+            try:
+                op, modes = decode(mem[ip])
+            except IntcodeError:
+                break
+            if op not in STRAIGHT and op not in BRANCHES and op != ADD_RELATIVE_BASE:
+                break
+            length = 1 + len(modes)
+            if ip + length > len(mem) or any(ip <= w < ip + length for w in writes):
+                break
+
+            operands = {}
+            guard = []
+            relative = []
+            for name, mode, kind, word in zip("abc", modes, OPS[op], mem[ip + 1:ip + length]):
+                if mode == IMMEDIATE:
+                    operands[name] = str(word)
+                elif mode == POSITION and kind == READ:
+                    operands[name] = f"mem[{word}]" if 0 <= word < len(mem) else f"vm.load({word})"
+                elif mode == POSITION:
+                    if not 0 <= word < len(mem) or self.watch[word] or start <= word < ip + length:
+                        break
+                    writes.append(word)
+                    operands[name] = f"mem[{word}]"
+                elif kind == READ:
+                    uses_rb = True
+                    relative.append(word)
+                    operands[name] = f"mem[rb + {word}]"
+                else:
+                    uses_rb = True
+                    relative.append(word)
+                    guard = [f"_a = rb + {word}", "if watch[_a]:", "    raise IndexError"]
+                    operands[name] = "mem[_a]"
+            else:
+                instructions.append(Instruction(ip, op, modes, tuple(mem[ip + 1:ip + length])))
+                lines.append(f"p = {ip}")
+                if relative:
+                    lines.extend([f"if rb < {-min(relative)}:", "    raise IndexError"])
+                lines.extend(guard)
+                if op == ADD_RELATIVE_BASE:
+                    uses_rb = True
+                    lines.append("rb += {a}".format(**operands))
+                elif op in STRAIGHT:
+                    lines.append(STRAIGHT[op].format(**operands))
+                else:
+                    branch = dict(taken=BRANCHES[op].format(**operands), fall=ip + length, **operands)
+                    static = modes[1] == IMMEDIATE and mem[ip + 2] >= 0
+                    exit_line = (BRANCH if static else COMPUTED_BRANCH).format(**branch)
+                ip += length
+                if limit is not None:
+                    limit -= 1
+                continue
+            break
+
+        if ip == start:
+            return interpreted(start)
+
+        for addr in range(start, ip):
+            for writer in list(self.writers.get(addr, ())):
+                self.drop(writer)
+            self.covering[addr].add(start)
+        self.watch[start:ip] = b"\x01" * (ip - start)
+        for addr in writes:
+            self.writers[addr].add(start)
+        self.ranges[start] = ip, writes
+
+        if exit_line is None:
+            exit_line = f"return {ip}" if limit == 0 else f"return ~{ip}"
+        loop = CountedLoop.match(instructions) if self.fusions is None else None
+        rearm = []
+        if loop is not None:
+            exit_line = LOOP_BRANCH.format(**branch)
+            rearm = ["loop.armed = True"]
+        sync = ["vm.relative_base = rb"] if uses_rb else []
+        body = "\n        ".join(lines + sync + exit_line.split("\n"))
+        handler = "\n        ".join(sync + rearm + ["return ~p"])
+        prologue = (
+            "    if loop.armed:\n"
+            "        skip = loop.fast_forward(vm)\n"
+            "        if skip is not None:\n"
+            "            return skip\n"
+            "        loop.armed = False\n"
+        )
+        source = (
+            f"def block(vm, mem):\n"
+            + (prologue if loop is not None else "")
+            + ("    rb = vm.relative_base\n" if uses_rb else "")
+            + f"    p = {start}\n"
+            f"    try:\n        {body}\n"
+            f"    except (IndexError, OverflowError):\n        {handler}\n"
+        )
+        namespace = {"watch": self.watch, "loop": loop}
+        exec(compile(source, f"<intcode block {start}>", "exec"), namespace)
+        block = namespace["block"]
+        block.size = len(instructions)
+        return block
+
+
+def interpreted(start):
+    """Stand-in for a block at `start`: decode and run one instruction per call."""
+    def step(vm, mem):
+        try:
+            return CHECKED_HANDLERS[mem[start]](vm, mem, start)
+        except (IndexError, OverflowError):
+            return ~start
+    step.size = 1
+    return step
+
+
+class BlockTable(dict):
+    """Block start -> compiled block. A start is interpreted until it has been entered HOT times."""
+
+    def __init__(self, compiler):
+        super().__init__()
+        self.compiler = compiler
+        self.entries = Counter()
+
+    def __missing__(self, ip):
+        self.entries[ip] += 1
+        if self.entries[ip] < HOT:
+            return interpreted(ip)
+        block = self[ip] = self.compiler.compile(ip)
+        return block
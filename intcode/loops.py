@@ -0,0 +1,180 @@
+"""Closed-form execution of simple counting loops."""
+from .opcodes import (
+    ADD, EQUALS, IMMEDIATE, JUMP_FALSE, JUMP_TRUE, LESS_THAN, MUL, OPS, RELATIVE, WRITE,
+)
+
+BODY = (ADD, MUL, LESS_THAN, EQUALS)
+
+# Loops that would exit within this many iterations aren't worth skipping.
+MIN_TRIPS = 4
+
+
+class CountedLoop:
+    """A block that branches back to its own start, whose iterations can be skipped.
+
+    The body may only hold add/mul/compare instructions and each address
+    may be written by one of them. Every write has to be one of:
+
+    - an induction step `x = x + k`;
+    - a value computed from loop invariants (immediates, or addresses the
+      loop doesn't write);
+    - a comparison of induction variables and invariants.
+
+    The closing branch must test an induction variable or a comparison
+    result. Then every variable is affine in the iteration count, the trip
+    count comes from solving the exit test, and the final state can be
+    written straight out. `fast_forward` works this out at loop entry from
+    the current memory, and returns None to let the loop run normally when
+    something doesn't fit: reads of loop-computed values, branches that
+    never exit, short trip counts, negative addresses.
+
+    `armed` is cleared by the compiled block once `fast_forward` has failed,
+    and set again when control leaves the loop, so a loop with no closed
+    form is only checked once per entry rather than once per iteration.
+    """
+
+    def __init__(self, instructions):
+        self.instructions = instructions
+        self.branch = instructions[-1]
+        self.start = instructions[0].addr
+        self.exit = self.branch.next
+        self.armed = True
+
+    @classmethod
+    def match(cls, instructions):
+        """A CountedLoop if `instructions` (a block) has the right shape, else None."""
+        if len(instructions) < 2:
+            return None
+        branch = instructions[-1]
+        if branch.op not in (JUMP_TRUE, JUMP_FALSE) or branch.static_target() != instructions[0].addr:
+            return None
+        if any(instr.op not in BODY for instr in instructions[:-1]):
+            return None
+        return cls(instructions)
+
+    def resolve(self, vm, instr):
+        """Operands of `instr` as ('imm', value) or ('addr', address)."""
+        operands = []
+        for mode, param in zip(instr.modes, instr.params):
+            if mode == IMMEDIATE:
+                operands.append(('imm', param))
+                continue
+            addr = param + vm.relative_base if mode == RELATIVE else param
+            if addr < 0:
+                return None
+            operands.append(('addr', addr))
+        return operands
+
+    def fast_forward(self, vm):
+        """Run the loop to completion in closed form and return `~exit`, or None."""
+        body = []
+        written = {}
+        for i, instr in enumerate(self.instructions):
+            operands = self.resolve(vm, instr)
+            if operands is None:
+                return None
+            body.append(operands)
+            for kind, (_, addr) in zip(OPS[instr.op], operands):
+                if kind == WRITE:
+                    if addr in written or self.start <= addr < self.exit:
+                        return None
+                    written[addr] = i
+
+        def invariant(operand):
+            kind, value = operand
+            if kind == 'imm':
+                return value
+            return None if value in written else vm.load(value)
+
+        # Induction steps: addr -> (value at loop entry, step)
+        steps = {}
+        for i, (instr, operands) in enumerate(zip(self.instructions[:-1], body)):
+            a, b, (_, target) = operands
+            if instr.op == ADD:
+                for this, other in ((a, b), (b, a)):
+                    k = invariant(other)
+                    if this == ('addr', target) and k is not None:
+                        steps[target] = (vm.load(target), k)
+                        break
+
+        def affine(operand, at):
+            """(c0, c1) such that the operand read by instruction `at` in iteration n is c0 + c1*n."""
+            kind, value = operand
+            if kind == 'addr' and value in steps:
+                v0, k = steps[value]
+                return (v0 + k, k) if written[value] < at else (v0, k)
+            c = invariant(operand)
+            return None if c is None else (c, 0)
+
+        results = {}
+        for i, (instr, operands) in enumerate(zip(self.instructions[:-1], body)):
+            a, b, (_, target) = operands
+            if target in steps:
+                continue
+            x, y = affine(a, i), affine(b, i)
+            if x is None or y is None:
+                return None
+            if instr.op in (ADD, MUL):
+                if x[1] or y[1]:
+                    return None
+                results[target] = ('const', x[0] + y[0] if instr.op == ADD else x[0] * y[0])
+            else:
+                results[target] = (instr.op, x[0] - y[0], x[1] - y[1])
+
+        cond = body[-1][0]
+        if cond[0] != 'addr' or cond[1] not in written:
+            return None
+        if cond[1] in steps:
+            # Continue while the value is non-zero (jump-if-true) or zero (jump-if-false).
+            d0, d1 = affine(cond, len(body))
+            exit_after = _first_zero(d0, d1) if self.branch.op == JUMP_TRUE else _first_nonzero(d0, d1)
+        else:
+            result = results[cond[1]]
+            if result[0] == 'const':
+                return None
+            op, d0, d1 = result
+            if op == LESS_THAN:
+                # The flag is 1 while d0 + d1*n < 0.
+                exit_after = _first_nonnegative(d0, d1) if self.branch.op == JUMP_TRUE \
+                    else _first_nonnegative(-d0 - 1, -d1)
+            else:
+                exit_after = _first_nonzero(d0, d1) if self.branch.op == JUMP_TRUE else _first_zero(d0, d1)
+        if exit_after is None or exit_after + 1 < MIN_TRIPS:
+            return None
+
+        trips = exit_after + 1
+        for addr, (v0, k) in steps.items():
+            vm.store(addr, v0 + trips * k)
+        last = trips - 1
+        for addr, result in results.items():
+            if result[0] == 'const':
+                vm.store(addr, result[1])
+            else:
+                op, d0, d1 = result
+                d = d0 + d1 * last
+                vm.store(addr, 1 if (d < 0 if op == LESS_THAN else d == 0) else 0)
+        vm.skipped += trips * len(self.instructions)
+        return ~self.exit
+
+
+def _first_zero(d0, d1):
+    """Smallest n >= 0 with d0 + d1*n == 0, or None."""
+    if d1 == 0:
+        return 0 if d0 == 0 else None
+    n, rem = divmod(-d0, d1)
+    return n if rem == 0 and n >= 0 else None
+
+
+def _first_nonzero(d0, d1):
+    if d0 != 0:
+        return 0
+    return 1 if d1 != 0 else None
+
+
+def _first_nonnegative(d0, d1):
+    """Smallest n >= 0 with d0 + d1*n >= 0, or None."""
+    if d0 >= 0:
+        return 0
+    if d1 <= 0:
+        return None
+    return -(d0 // d1)
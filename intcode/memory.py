@@ -0,0 +1,127 @@
+from array import array
+
+from .opcodes import IntcodeError
+
+PAGE_BITS = 10
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+
+_ZERO_PAGE = array('q', bytes(8 * PAGE_SIZE))
+
+
+class PagedMemory:
+    """Intcode memory that scales with the working set rather than the highest address.
+
+    The code segment lives in `dense`, padded to a whole number of pages, which
+    the interpreter indexes directly. It is an int64 `array('q')` when
+    `typecode='q'` is given, or a plain list of Python ints otherwise. The
+    first value that doesn't fit in int64 turns it into a list for good
+    (`widen`). It grows a page at a time when a write lands just past its
+    end. Anything further out goes to zero-filled `array('q')` pages that
+    are only allocated on first write; untouched pages read as 0. A page
+    whose values outgrow int64 is converted to a list.
+
+    `fork()` shares the sparse pages copy-on-write: a page is only copied by the
+    side that writes to it first. Pages restored from a checkpoint are
+    read-only views of the file and are copied the same way. The dense
+    segment is shared too, as a whole, and copied by `own_dense()` before
+    the first write from either side. It stays one flat sequence because
+    handlers and compiled blocks index it directly, so whoever is about to
+    run code against it (`VM.execute`, `VM.run_slice`) has to own it first.
+    `dense_users` is a one-item list, shared by every memory that shares
+    `dense`, counting them.
+    """
+
+    def __init__(self, code, typecode=None):
+        if typecode is None:
+            self.dense = list(code)
+            self.dense.extend([0] * (-len(self.dense) % PAGE_SIZE))
+        else:
+            self.dense = array(typecode, code)
+            self.dense.frombytes(bytes(self.dense.itemsize * (-len(self.dense) % PAGE_SIZE)))
+        self.dense_users = [1]
+        self.pages = {}
+        self.owned = set()
+
+    def fork(self):
+        other = PagedMemory.__new__(PagedMemory)
+        other.dense = self.dense
+        other.dense_users = self.dense_users
+        self.dense_users[0] += 1
+        other.pages = self.pages.copy()
+        other.owned = set()
+        self.owned = set()
+        return other
+
+    def own_dense(self):
+        """The dense segment, copied first if another fork still shares it."""
+        if self.dense_users[0] > 1:
+            self.dense_users[0] -= 1
+            self.dense = self.dense[:]
+            self.dense_users = [1]
+        return self.dense
+
+    def load(self, addr):
+        if addr < len(self.dense):
+            if addr < 0:
+                raise IntcodeError(f"Invalid access to negative memory index: {addr}")
+            return self.dense[addr]
+        page = self.pages.get(addr >> PAGE_BITS)
+        return 0 if page is None else page[addr & PAGE_MASK]
+
+    def store(self, addr, val):
+        dense = self.dense
+        if addr < len(dense):
+            if addr < 0:
+                raise IntcodeError(f"Invalid access to negative memory index: {addr}")
+            if self.dense_users[0] > 1:
+                dense = self.own_dense()
+            try:
+                dense[addr] = val
+            except OverflowError:
+                self.widen()[addr] = val
+            return
+
+        index = addr >> PAGE_BITS
+        if index == len(dense) >> PAGE_BITS:
+            self.grow_dense()
+            self.store(addr, val)
+            return
+
+        page = self.pages.get(index)
+        if page is None:
+            page = self.pages[index] = array('q', _ZERO_PAGE)
+            self.owned.add(index)
+        elif index not in self.owned:
+            page = self.pages[index] = array('q', page.tobytes()) if isinstance(page, memoryview) else page[:]
+            self.owned.add(index)
+        try:
+            page[addr & PAGE_MASK] = val
+        except OverflowError:
+            page = self.pages[index] = list(page)
+            page[addr & PAGE_MASK] = val
+
+    def widen(self):
+        """Switch the dense segment to Python ints, once its values outgrow int64."""
+        if isinstance(self.dense, list):
+            return self.own_dense()
+        self.dense_users[0] -= 1
+        self.dense_users = [1]
+        self.dense = list(self.dense)
+        return self.dense
+
+    def grow_dense(self):
+        """Append the next page to the dense segment, absorbing any sparse pages that follow."""
+        self.own_dense()
+        index = len(self.dense) >> PAGE_BITS
+        while True:
+            page = self.pages.pop(index, None)
+            if isinstance(page, list):
+                self.widen()
+            self.dense.extend(page if page is not None else _ZERO_PAGE)
+            index += 1
+            if index not in self.pages:
+                break
+
+    def resident_words(self):
+        return len(self.dense) + len(self.pages) * PAGE_SIZE
@@ -0,0 +1,67 @@
+POSITION = 0
+IMMEDIATE = 1
+RELATIVE = 2
+
+ADD = 1
+MUL = 2
+IN = 3
+OUT = 4
+JUMP_TRUE = 5
+JUMP_FALSE = 6
+LESS_THAN = 7
+EQUALS = 8
+ADD_RELATIVE_BASE = 9
+HALT = 99
+
+READ = 0
+WRITE = 1
+
+OPS = {
+    ADD: (READ, READ, WRITE),
+    MUL: (READ, READ, WRITE),
+    IN: (WRITE,),
+    OUT: (READ,),
+    JUMP_TRUE: (READ, READ),
+    JUMP_FALSE: (READ, READ),
+    LESS_THAN: (READ, READ, WRITE),
+    EQUALS: (READ, READ, WRITE),
+    ADD_RELATIVE_BASE: (READ,),
+    HALT: (),
+}
+
+NAMES = {
+    ADD: 'add',
+    MUL: 'mul',
+    IN: 'in',
+    OUT: 'out',
+    JUMP_TRUE: 'jump_if_true',
+    JUMP_FALSE: 'jump_if_false',
+    LESS_THAN: 'less_than',
+    EQUALS: 'equals',
+    ADD_RELATIVE_BASE: 'add_relative_base',
+    HALT: 'halt',
+}
+
+
+class IntcodeError(Exception):
+    pass
+
+
+def decode(instr):
+    """Split an instruction word into its opcode and a tuple of parameter modes."""
+    op = instr % 100
+    if op not in OPS:
+        raise IntcodeError(f"Unknown opcode: {op}")
+
+    modes = []
+    rest = instr // 100
+    for kind in OPS[op]:
+        mode = rest % 10
+        rest //= 10
+        if mode not in (POSITION, IMMEDIATE, RELATIVE):
+            raise IntcodeError(f"Invalid arg mode: {mode}")
+        if mode == IMMEDIATE and kind == WRITE:
+            raise IntcodeError(f"Invalid arg mode for write arg: {mode}")
+        modes.append(mode)
+
+    return op, tuple(modes)
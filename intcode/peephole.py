@@ -0,0 +1,208 @@
+"""Peephole optimisation of Intcode programs: python -m intcode.peephole program.txt
+
+`optimize(code)` returns a program of the same length that any engine can
+run in place of the original. No word moves, so every address the program
+reads, writes or jumps to still means the same thing. The rewrites are:
+
+- constant folding: arithmetic and comparisons whose operands are known
+  become `add value, 0 -> dst`, and branches whose condition or target is
+  known take it as an immediate;
+- jump threading: a jump whose target only passes control on (an
+  unconditional jump, a branch that is never taken, a write of a value to
+  itself, a branch on the same condition) goes straight to where control
+  ends up;
+- unreachable code after an unconditional jump or halt is zeroed.
+
+Where execution can start isn't known statically, because of computed
+jumps, so every word value that is a valid address is treated as a
+possible entry point and decoded. A program with a position-mode write
+into any decoded instruction is returned unchanged: once it patches its
+own code, the accesses and jump targets decoded here no longer describe
+what runs. Otherwise an instruction is only rewritten if no other
+decoding overlaps it and no position-mode access touches its words. Relative-mode accesses are assumed to stay clear of code, as
+they do for the stack in well-behaved programs. Values are only taken to
+be known in straight-line code that has no other way in, or for words
+that are never written when the program has no relative-mode writes.
+Code that is unreachable is only zeroed in programs with no relative-mode
+accesses at all. A program that faults on a negative address may run on
+past the fault once optimised.
+"""
+from .analysis import BRANCHES, CFG
+from .opcodes import (
+    ADD, EQUALS, IMMEDIATE, JUMP_TRUE, LESS_THAN, MUL, OPS, POSITION, RELATIVE, WRITE,
+)
+
+FOLD = {
+    ADD: lambda a, b: a + b,
+    MUL: lambda a, b: a * b,
+    LESS_THAN: lambda a, b: int(a < b),
+    EQUALS: lambda a, b: int(a == b),
+}
+
+
+class Peephole:
+    def __init__(self, code):
+        self.code = list(code)
+        self.entries = {0} | {word for word in self.code if 0 <= word < len(self.code)}
+        self.instructions = CFG(self.code, sorted(self.entries)).instructions
+        self.cover = {}
+        self.shared = set()
+        self.reads = set()
+        self.writes = set()
+        self.relative = self.relative_writes = False
+        for instr in self.instructions.values():
+            for word in range(instr.addr, instr.next):
+                if word in self.cover:
+                    self.shared.add(word)
+                self.cover[word] = instr.addr
+            for mode, param, kind in zip(instr.modes, instr.params, OPS[instr.op]):
+                if mode == POSITION:
+                    (self.writes if kind == WRITE else self.reads).add(param)
+                elif mode == RELATIVE:
+                    self.relative = True
+                    self.relative_writes |= kind == WRITE
+        self.falls_in = {}
+        for instr in self.instructions.values():
+            if instr.falls_through():
+                self.falls_in[instr.next] = self.falls_in.get(instr.next, 0) + 1
+
+    def stable(self, instr):
+        """True if nothing writes to the words of `instr` while the program runs."""
+        return not any(word in self.writes for word in range(instr.addr, instr.next))
+
+    def editable(self, instr):
+        words = range(instr.addr, instr.next)
+        return (not any(word in self.shared or word in self.reads for word in words)
+                and not any(word in self.entries for word in words[1:]))
+
+    def constant(self, addr):
+        """Value of the word at `addr` if the program never changes it, else None."""
+        if self.relative_writes or addr < 0 or addr in self.writes:
+            return None
+        return self.code[addr] if addr < len(self.code) else 0
+
+    def value(self, known, mode, param):
+        if mode == IMMEDIATE:
+            return param
+        if mode == POSITION:
+            return known[param] if param in known else self.constant(param)
+        return None
+
+    def fold(self, out):
+        """Rewrite instructions whose operands are known into `out`."""
+        known = {}
+        previous = None
+        for addr in sorted(self.instructions):
+            instr = self.instructions[addr]
+            if addr in self.entries or self.falls_in.get(addr) != 1 \
+                    or previous is None or previous.next != addr or not previous.falls_through():
+                known = {}
+            previous = instr
+            values = [self.value(known, mode, param) for mode, param in zip(instr.modes, instr.params)]
+            result = None
+            if instr.op in FOLD:
+                a, b, _ = values
+                result = None if a is None or b is None else FOLD[instr.op](a, b)
+                if result is not None and self.editable(instr):
+                    out[addr:addr + 4] = [ADD + 100 * IMMEDIATE + 1000 * IMMEDIATE + 10000 * instr.modes[2],
+                                          result, 0, instr.params[2]]
+            elif instr.op in BRANCHES and self.editable(instr):
+                cond, target = values
+                modes = [IMMEDIATE if value is not None else mode for value, mode in zip(values, instr.modes)]
+                params = [param if value is None else value for value, param in zip(values, instr.params)]
+                out[addr:addr + 3] = [instr.op + 100 * modes[0] + 1000 * modes[1], *params]
+            for mode, param, kind in zip(instr.modes, instr.params, OPS[instr.op]):
+                if kind != WRITE:
+                    continue
+                if mode == RELATIVE:
+                    known = {}
+                elif result is None:
+                    known.pop(param, None)
+                else:
+                    known[param] = result
+
+    def thread(self, code, branch):
+        """Where control ends up when `branch` (decoded from `code`) is taken."""
+        cfg = CFG.__new__(CFG)
+        cfg.code = code
+        cond = (branch.modes[0], branch.params[0])
+        # What taking `branch` says about its condition, if it isn't an immediate.
+        truth = None if cond[0] == IMMEDIATE else branch.op == JUMP_TRUE
+        target = branch.params[1]
+        seen = {branch.addr}
+        while target not in seen and target in self.instructions:
+            seen.add(target)
+            instr = cfg.decode_at(target)
+            if instr is None:
+                break
+            if instr.op in BRANCHES:
+                if instr.modes[0] == IMMEDIATE:
+                    taken = (instr.params[0] != 0) == (instr.op == JUMP_TRUE)
+                elif truth is not None and (instr.modes[0], instr.params[0]) == cond:
+                    taken = truth == (instr.op == JUMP_TRUE)
+                else:
+                    break
+                if not taken:
+                    target = instr.next
+                elif instr.modes[1] == IMMEDIATE:
+                    target = instr.params[1]
+                else:
+                    break
+            elif is_identity(instr):
+                target = instr.next
+            else:
+                break
+        return target
+
+    def optimize(self):
+        out = list(self.code)
+        if not all(self.stable(instr) for instr in self.instructions.values()):
+            return out
+        self.fold(out)
+        cfg = CFG.__new__(CFG)
+        cfg.code = out
+        for addr in sorted(self.instructions):
+            instr = cfg.decode_at(addr)
+            if instr is None or instr.op not in BRANCHES or instr.modes[1] != IMMEDIATE \
+                    or not self.editable(self.instructions[addr]):
+                continue
+            out[addr + 2] = self.thread(out, instr)
+        if not self.relative:
+            self.zero_unreachable(cfg, out)
+        return out
+
+    def zero_unreachable(self, cfg, out):
+        """Zero the words after each instruction that never falls through, up to the next decoded one."""
+        for addr in sorted(self.instructions):
+            instr = cfg.decode_at(addr)
+            if instr is None or instr.falls_through() or not self.editable(self.instructions[addr]):
+                continue
+            word = instr.next
+            while word < len(out) and word not in self.cover:
+                if word not in self.reads and word not in self.writes:
+                    out[word] = 0
+                word += 1
+
+
+def is_identity(instr):
+    """True for `x = x + 0` and `x = x * 1`, which leave memory as it was."""
+    if instr.op not in (ADD, MUL):
+        return False
+    unit = 0 if instr.op == ADD else 1
+    a, b, dst = zip(instr.modes, instr.params)
+    if dst[0] == POSITION and dst[1] < 0:
+        return False
+    return (a == dst and b == (IMMEDIATE, unit)) or (b == dst and a == (IMMEDIATE, unit))
+
+
+def optimize(code):
+    """An equivalent program with the same layout that executes fewer instructions."""
+    return Peephole(code).optimize()
+
+
+if __name__ == '__main__':
+    import sys
+
+    from .vm import load
+
+    print(','.join(map(str, optimize(load(sys.argv[1])))))
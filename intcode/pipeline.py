@@ -0,0 +1,105 @@
+from collections import deque
+
+
+class Pipeline:
+    """Runs VMs whose outputs feed other VMs' inputs.
+
+    `connect` makes the producer's `outputs` and the consumer's `inputs` the
+    same deque, so values move with an O(1) append/popleft and nothing is
+    copied. A consumer with several producers reads one deque that they all
+    append to. A producer with several consumers broadcasts every value to
+    each of them. A VM is resumed only when it has unread input, and it then runs
+    until it blocks or halts. Nothing polls VMs that cannot make progress.
+    """
+
+    def __init__(self, vms=()):
+        self.vms = list(vms)
+        self.downstream = {}
+
+    @classmethod
+    def chain(cls, vms):
+        pipeline = cls(vms)
+        for src, dst in zip(vms, vms[1:]):
+            pipeline.connect(src, dst)
+        return pipeline
+
+    @classmethod
+    def ring(cls, vms):
+        pipeline = cls.chain(vms)
+        pipeline.connect(vms[-1], vms[0])
+        return pipeline
+
+    def connect(self, src, dst):
+        """Route src's outputs into dst. Values already queued for dst are read first."""
+        channel = dst.inputs
+        consumers = self.downstream.setdefault(src, [])
+        if not consumers:
+            channel.extend(src.outputs)
+            src.outputs = channel
+        elif isinstance(src.outputs, Broadcast):
+            src.outputs.channels.append(channel)
+        else:
+            src.outputs = Broadcast([src.outputs, channel])
+        consumers.append(dst)
+
+    def run(self):
+        """Run until every VM has halted or is blocked on an empty channel."""
+        ready = deque(vm for vm in self.vms if not vm.halted)
+        queued = set(ready)
+        plan = self.plan()
+        while ready:
+            vm = ready.popleft()
+            queued.remove(vm)
+            execute, consumers = plan[vm]
+            execute()
+            for consumer in consumers:
+                if consumer.inputs and consumer not in queued and not consumer.halted:
+                    ready.append(consumer)
+                    queued.add(consumer)
+        return self
+
+    def plan(self):
+        """VM -> (its engine, its consumers), with every VM set up to run until it blocks.
+
+        Resolving this once per run instead of going through `VM.execute`
+        on every resume matters when each resume only moves one value.
+        """
+        downstream = self.downstream
+        plan = {}
+        for vm in self.members():
+            vm.pause_on_output = False
+            vm.mem = vm.memory.own_dense()
+            plan[vm] = vm.engine(), downstream.get(vm, ())
+        return plan
+
+    def members(self):
+        """The listed VMs, then any VM only reached through `connect`, in order."""
+        vms = dict.fromkeys(self.vms)
+        for consumers in self.downstream.values():
+            vms.update(dict.fromkeys(consumers))
+        return list(vms)
+
+    @property
+    def halted(self):
+        return all(vm.halted for vm in self.vms)
+
+
+class Broadcast:
+    """Stands in for the `outputs` of a VM with several consumers.
+
+    Each value is appended to every consumer's channel. Nothing is kept
+    here, so it is always empty from the producer's side.
+    """
+
+    def __init__(self, channels):
+        self.channels = channels
+
+    def append(self, value):
+        for channel in self.channels:
+            channel.append(value)
+
+    def __len__(self):
+        return 0
+
+    def __iter__(self):
+        return iter(())
@@ -0,0 +1,128 @@
+import json
+from collections import Counter, defaultdict
+from time import perf_counter
+
+from .opcodes import IN, JUMP_FALSE, JUMP_TRUE, NAMES, OUT, decode
+from .vm import HANDLERS, Halt, NeedInput, Output
+
+BLOCK_ENDS = (JUMP_TRUE, JUMP_FALSE, IN, OUT)
+
+
+class Profiler:
+    """Opt-in instrumentation for a single VM.
+
+    `Profiler.attach(vm)` routes that VM through an instrumented copy of the
+    interpreter loop. VMs without a profiler never reach this code, so the
+    only cost left in the normal path is one attribute check per `execute`
+    call. A profiled VM always interprets, even if it was created with the
+    compiled backend.
+
+    Instructions are counted per instruction word and per address. Wall time
+    is charged to the dynamic block it ran in: the straight-line run that
+    starts at a jump target or after an I/O instruction, keyed by its first
+    address.
+    """
+
+    def __init__(self, vm):
+        self.vm = vm
+        self.words = Counter()
+        self.ips = Counter()
+        self.block_counts = Counter()
+        self.block_time = defaultdict(float)
+        self.input_waits = 0
+        self.memory_high_water = vm.memory.resident_words()
+        self.wall_time = 0.0
+
+    @classmethod
+    def attach(cls, vm):
+        vm.profiler = cls(vm)
+        return vm.profiler
+
+    def end_block(self, start, began):
+        now = perf_counter()
+        self.block_counts[start] += 1
+        self.block_time[start] += now - began
+        self.memory_high_water = max(self.memory_high_water, self.vm.memory.resident_words())
+        return now
+
+    def execute(self):
+        vm = self.vm
+        mem = vm.mem
+        handlers = HANDLERS
+        words = self.words
+        ips = self.ips
+        ip = block = vm.ip
+        started = began = perf_counter()
+        slow = False
+        while not vm.halted:
+            try:
+                if slow:
+                    slow = False
+                    ip = vm.slow_step(ip)
+                    mem = vm.mem
+                while True:
+                    instr = mem[ip]
+                    handler = handlers[instr]
+                    words[instr] += 1
+                    ips[ip] += 1
+                    ip = handler(vm, mem, ip)
+                    if handler.op in BLOCK_ENDS:
+                        began = self.end_block(block, began)
+                        block = ip
+            except IndexError:
+                slow = True
+                if ip >= len(mem):
+                    words[vm.load(ip)] += 1
+                    ips[ip] += 1
+            except OverflowError:
+                words[mem[ip]] -= 1
+                ips[ip] -= 1
+                mem = vm.widen()
+            except Output:
+                ip += 2
+                break
+            except NeedInput:
+                words[vm.load(ip)] -= 1
+                ips[ip] -= 1
+                if not vm.pull():
+                    self.input_waits += 1
+                    break
+            except Halt:
+                vm.halted = True
+        self.end_block(block, began)
+        self.wall_time += perf_counter() - started
+        vm.ip = ip
+
+    def report(self, top=20):
+        opcodes = Counter()
+        modes = Counter()
+        for instr, count in self.words.items():
+            if count <= 0:
+                continue
+            op, op_modes = decode(instr)
+            opcodes[NAMES[op]] += count
+            modes[f"{NAMES[op]} {','.join(map(str, op_modes))}".strip()] += count
+        return {
+            'instructions': sum(opcodes.values()),
+            'wall_time': self.wall_time,
+            'opcodes': dict(opcodes.most_common()),
+            'modes': dict(modes.most_common()),
+            'hot_ips': [[ip, count] for ip, count in self.ips.most_common(top)],
+            'memory_high_water': self.memory_high_water,
+            'input_waits': self.input_waits,
+            'outputs': opcodes[NAMES[OUT]],
+            'blocks': {
+                str(start): {'count': self.block_counts[start], 'time': self.block_time[start]}
+                for start in sorted(self.block_counts)
+            },
+        }
+
+    def write_json(self, path, top=20):
+        with open(path, 'w') as f:
+            json.dump(self.report(top), f, indent=2)
+
+    def write_folded(self, path, root='intcode'):
+        """Block wall times in microseconds, in the folded-stack format flamegraph.pl reads."""
+        with open(path, 'w') as f:
+            for start in sorted(self.block_time):
+                f.write(f"{root};block@{start} {round(self.block_time[start] * 1e6)}\n")
@@ -0,0 +1,135 @@
+import os
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from .pipeline import Pipeline
+
+BUDGET = 10_000
+
+
+class Scheduler(Pipeline):
+    """Time-sliced scheduling for large networks of connected VMs.
+
+    Topologies are built with `connect` as for a `Pipeline`: chains, rings,
+    meshes (several producers into one consumer) and broadcast (one
+    producer into several consumers). Runnable VMs take turns from a FIFO
+    queue and each turn runs about `budget` instructions, so a VM spinning
+    in a tight loop can't starve the others. A VM that blocks on an empty
+    channel is parked, and it is queued again only when one of its
+    producers writes to it.
+
+    With `workers` > 1, the connected components of the topology are
+    shared out between worker processes. VMs that talk to each other always
+    stay in the same process, so channels never cross a process boundary.
+    The VMs in the parent are updated in place once the workers finish.
+    VMs that are only reached through `connect` are scheduled as well, and
+    are appended to `vms` so that `report` covers them.
+    """
+
+    def __init__(self, vms=(), budget=BUDGET):
+        super().__init__(vms)
+        self.budget = budget
+        self.instructions = Counter()
+        self.slices = Counter()
+        self.busy = defaultdict(float)
+        self.wall_time = 0.0
+
+    def run(self, workers=1):
+        """Run until every VM has halted or is blocked on an empty channel."""
+        started = perf_counter()
+        self.vms = self.members()
+        if workers is None:
+            workers = os.cpu_count() or 1
+        groups = self.components() if workers > 1 else []
+        if len(groups) > 1:
+            self.run_parallel(groups, workers)
+        else:
+            self.run_slices()
+        self.wall_time += perf_counter() - started
+        return self
+
+    def run_slices(self):
+        ready = deque(vm for vm in self.vms if not vm.halted)
+        queued = set(ready)
+        downstream = self.downstream
+        index = {vm: i for i, vm in enumerate(self.vms)}
+        budget = self.budget
+        while ready:
+            vm = ready.popleft()
+            began = perf_counter()
+            ran = vm.run_slice(budget)
+            i = index[vm]
+            self.busy[i] += perf_counter() - began
+            self.instructions[i] += ran
+            self.slices[i] += 1
+            if ran >= budget and not vm.halted:
+                ready.append(vm)
+            else:
+                queued.remove(vm)
+            for consumer in downstream.get(vm, ()):
+                if consumer.inputs and consumer not in queued and not consumer.halted:
+                    ready.append(consumer)
+                    queued.add(consumer)
+
+    def components(self):
+        """Indices of the VMs in each connected component of the topology."""
+        index = {vm: i for i, vm in enumerate(self.vms)}
+        parent = list(range(len(self.vms)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for src, consumers in self.downstream.items():
+            for dst in consumers:
+                parent[find(index[src])] = find(index[dst])
+        groups = defaultdict(list)
+        for i in range(len(self.vms)):
+            groups[find(i)].append(i)
+        return list(groups.values())
+
+    def run_parallel(self, groups, workers):
+        parts = [[] for _ in range(min(workers, len(groups)))]
+        for n, group in enumerate(sorted(groups, key=len, reverse=True)):
+            parts[n % len(parts)].extend(group)
+        tasks = []
+        for part in parts:
+            sub = Scheduler([self.vms[i] for i in part], self.budget)
+            sub.downstream = {vm: self.downstream[vm] for vm in sub.vms if vm in self.downstream}
+            tasks.append(sub)
+        with ProcessPoolExecutor(len(tasks)) as pool:
+            for part, sub in zip(parts, pool.map(_run_part, tasks)):
+                for n, i in enumerate(part):
+                    # Goes through pickling's state hooks so that a compiled
+                    # VM gets a compiler bound to itself, not to the copy.
+                    self.vms[i].__setstate__(sub.vms[n].__getstate__())
+                    self.instructions[i] += sub.instructions[n]
+                    self.slices[i] += sub.slices[n]
+                    self.busy[i] += sub.busy[n]
+
+    def report(self):
+        """Per-VM and aggregate instruction counts and throughput."""
+        total = sum(self.instructions.values())
+        return {
+            'instructions': total,
+            'wall_time': self.wall_time,
+            'instructions_per_second': total / self.wall_time if self.wall_time else 0.0,
+            'vms': [
+                {
+                    'instructions': self.instructions[i],
+                    'slices': self.slices[i],
+                    'time': self.busy[i],
+                    'instructions_per_second': self.instructions[i] / self.busy[i] if self.busy[i] else 0.0,
+                    'halted': vm.halted,
+                }
+                for i, vm in enumerate(self.vms)
+            ],
+        }
+
+
+def _run_part(scheduler):
+    scheduler.run_slices()
+    return scheduler
@@ -0,0 +1,139 @@
+import os
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from math import prod
+from multiprocessing import Event
+from multiprocessing.shared_memory import SharedMemory
+
+from .vm import VM
+
+CHECK_EVERY = 256
+
+
+class Grid:
+    """Cartesian product of memory pokes, e.g. Grid({1: range(100), 2: range(100)}).
+
+    Points are computed from their index, so a grid of 10**8 points costs
+    nothing until it is walked.
+    """
+
+    def __init__(self, axes):
+        self.axes = list(axes.items())
+
+    def __len__(self):
+        return prod(len(values) for _, values in self.axes)
+
+    def __getitem__(self, index):
+        point = {}
+        for addr, values in reversed(self.axes):
+            index, i = divmod(index, len(values))
+            point[addr] = values[i]
+        return point
+
+
+class MemoryEquals:
+    def __init__(self, addr, value):
+        self.addr = addr
+        self.value = value
+
+    def __call__(self, vm):
+        return vm[self.addr] == self.value
+
+
+def poke(vm, point):
+    for addr, value in point.items():
+        vm[addr] = value
+
+
+def search(snapshot, grid, start, stop, predicate, setup=poke, found=None):
+    """Index of the first point in grid[start:stop] that satisfies `predicate`, or None."""
+    for index in range(start, stop):
+        if found is not None and index % CHECK_EVERY == 0 and found.is_set():
+            return None
+        vm = snapshot.fork()
+        setup(vm, grid[index])
+        vm.run()
+        if predicate(vm):
+            return index
+    return None
+
+
+_worker = {}
+
+
+def _init_worker(shm_name, length, code, found):
+    if shm_name is not None:
+        shm = SharedMemory(shm_name)
+        with shm.buf.cast('q') as view:
+            code = view.tolist()[:length]
+        shm.close()
+    _worker['snapshot'] = VM(code).snapshot()
+    _worker['found'] = found
+
+
+def _search_chunk(grid, start, stop, predicate, setup):
+    return search(_worker['snapshot'], grid, start, stop, predicate, setup, _worker['found'])
+
+
+def _share(program):
+    try:
+        packed = array('q', program)
+    except OverflowError:
+        return None
+    shm = SharedMemory(create=True, size=max(8, 8 * len(packed)))
+    with shm.buf.cast('q') as view:
+        view[:len(packed)] = packed
+    return shm
+
+
+def sweep(program, grid, predicate, setup=poke, workers=None, chunk_size=None):
+    """Run `program` once per grid point and return a point for which `predicate(vm)` holds.
+
+    The grid is cut into chunks that are handed to a pool of worker
+    processes. Each worker parses the program once from shared memory. The
+    first match stops every worker. If several chunks match at the same time,
+    the lowest index among them wins. Returns None when nothing matches.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        index = search(VM(program).snapshot(), grid, 0, len(grid), predicate, setup)
+        return None if index is None else grid[index]
+
+    total = len(grid)
+    chunk_size = chunk_size or max(1, min(4096, total // (workers * 8)))
+    chunks = iter(range(0, total, chunk_size))
+    shm = _share(program)
+    found = Event()
+    initargs = (shm and shm.name, len(program), None if shm else list(program), found)
+    match = None
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+            def submit():
+                start = next(chunks, None)
+                if start is not None:
+                    pending.add(pool.submit(_search_chunk, grid, start, min(start + chunk_size, total),
+                                            predicate, setup))
+
+            pending = set()
+            try:
+                for _ in range(workers * 2):
+                    submit()
+                while pending and match is None:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index = future.result()
+                        if index is not None and (match is None or index < match):
+                            match = index
+                    if match is None:
+                        for _ in done:
+                            submit()
+            finally:
+                # Also stops the other workers when one of them raised.
+                found.set()
+                for future in pending:
+                    future.cancel()
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+    return None if match is None else grid[match]
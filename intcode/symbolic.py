@@ -0,0 +1,239 @@
+from collections import deque
+from itertools import product
+
+from .opcodes import (
+    ADD, ADD_RELATIVE_BASE, EQUALS, HALT, IMMEDIATE, IN, JUMP_FALSE, JUMP_TRUE,
+    LESS_THAN, MUL, OPS, OUT, POSITION, READ, IntcodeError, decode,
+)
+from .sweep import Grid, MemoryEquals, sweep
+
+
+class SymbolicBranch(IntcodeError):
+    """The program needed a concrete value where it only had an expression."""
+
+
+class Unknown:
+    """A value read from a symbolic address. Harmless until something uses it."""
+
+    def __repr__(self):
+        return '?'
+
+
+UNKNOWN = Unknown()
+
+
+class Poly:
+    """Polynomial with integer coefficients, stored as {monomial: coefficient}.
+
+    A monomial is a sorted tuple of symbol names, so `noun * verb` is
+    ('noun', 'verb') and a constant term is ().
+    """
+
+    __slots__ = ('terms',)
+
+    def __init__(self, terms):
+        self.terms = {mono: coeff for mono, coeff in terms.items() if coeff}
+
+    @classmethod
+    def symbol(cls, name):
+        return cls({(name,): 1})
+
+    @staticmethod
+    def lift(value):
+        return value if isinstance(value, Poly) else Poly({(): value})
+
+    def simplify(self):
+        """Collapse constant polynomials back to plain ints."""
+        if not self.terms:
+            return 0
+        if len(self.terms) == 1 and () in self.terms:
+            return self.terms[()]
+        return self
+
+    def __add__(self, other):
+        terms = dict(self.terms)
+        for mono, coeff in Poly.lift(other).terms.items():
+            terms[mono] = terms.get(mono, 0) + coeff
+        return Poly(terms).simplify()
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return Poly({mono: -coeff for mono, coeff in self.terms.items()})
+
+    def __sub__(self, other):
+        return self + -Poly.lift(other)
+
+    def __mul__(self, other):
+        terms = {}
+        for mono_a, coeff_a in self.terms.items():
+            for mono_b, coeff_b in Poly.lift(other).terms.items():
+                mono = tuple(sorted(mono_a + mono_b))
+                terms[mono] = terms.get(mono, 0) + coeff_a * coeff_b
+        return Poly(terms).simplify()
+
+    __rmul__ = __mul__
+
+    @property
+    def symbols(self):
+        return sorted({name for mono in self.terms for name in mono})
+
+    def is_affine(self):
+        return all(len(mono) <= 1 for mono in self.terms)
+
+    def coefficient(self, mono):
+        return self.terms.get(mono, 0)
+
+    def __call__(self, **values):
+        total = 0
+        for mono, coeff in self.terms.items():
+            for name in mono:
+                coeff *= values[name]
+            total += coeff
+        return total
+
+    def __repr__(self):
+        parts = []
+        for mono, coeff in sorted(self.terms.items(), key=lambda term: (-len(term[0]), term[0])):
+            names = '*'.join(mono)
+            if not names:
+                parts.append(str(coeff))
+            elif coeff == 1:
+                parts.append(names)
+            else:
+                parts.append(f'{coeff}*{names}')
+        return ' + '.join(parts).replace('+ -', '- ')
+
+
+def _add(a, b):
+    if a is UNKNOWN or b is UNKNOWN:
+        return UNKNOWN
+    return a + b
+
+
+def _mul(a, b):
+    if a is UNKNOWN or b is UNKNOWN:
+        return UNKNOWN
+    return a * b
+
+
+class SymbolicVM:
+    """Runs straight-line Intcode over polynomials in named symbols.
+
+    `symbols` maps memory addresses to symbol names and `inputs` may hold
+    ints or Poly values. Any instruction that needs a concrete value it
+    doesn't have raises SymbolicBranch: a symbolic jump, comparison, write
+    address or relative base.
+    """
+
+    def __init__(self, code, symbols=None, inputs=()):
+        self.mem = dict(enumerate(code))
+        for addr, name in (symbols or {}).items():
+            self.mem[addr] = Poly.symbol(name)
+        self.inputs = deque(inputs)
+        self.outputs = []
+        self.ip = 0
+        self.relative_base = 0
+
+    def concrete(self, value, what):
+        if isinstance(value, int):
+            return value
+        raise SymbolicBranch(f"Symbolic {what} at ip {self.ip}: {value}")
+
+    def address(self, mode, word):
+        addr = word if mode == POSITION else _add(self.relative_base, word)
+        if not isinstance(addr, int):
+            return UNKNOWN
+        if addr < 0:
+            raise IntcodeError(f"Invalid access to negative memory index: {addr}")
+        return addr
+
+    def run(self):
+        mem = self.mem
+        while True:
+            op, modes = decode(self.concrete(mem.get(self.ip, 0), "instruction"))
+            args = []
+            for i, (mode, kind) in enumerate(zip(modes, OPS[op]), 1):
+                word = mem.get(self.ip + i, 0)
+                if mode == IMMEDIATE:
+                    args.append(word)
+                    continue
+                addr = self.address(mode, word)
+                if kind == READ:
+                    args.append(UNKNOWN if addr is UNKNOWN else mem.get(addr, 0))
+                else:
+                    args.append(self.concrete(addr, "write address"))
+            next_ip = self.ip + 1 + len(args)
+
+            if op == HALT:
+                return self
+            elif op == ADD:
+                mem[args[2]] = _add(args[0], args[1])
+            elif op == MUL:
+                mem[args[2]] = _mul(args[0], args[1])
+            elif op in (LESS_THAN, EQUALS):
+                diff = self.concrete(_add(args[0], _mul(args[1], -1)), "comparison")
+                mem[args[2]] = int(diff < 0 if op == LESS_THAN else diff == 0)
+            elif op in (JUMP_TRUE, JUMP_FALSE):
+                if (self.concrete(args[0], "branch") != 0) == (op == JUMP_TRUE):
+                    next_ip = self.concrete(args[1], "jump target")
+                    if next_ip < 0:
+                        raise IntcodeError(f"Jump to negative address: {next_ip}")
+            elif op == ADD_RELATIVE_BASE:
+                self.relative_base = self.concrete(_add(self.relative_base, args[0]), "relative base")
+            elif op == IN:
+                if not self.inputs:
+                    raise SymbolicBranch(f"Out of input at ip {self.ip}")
+                mem[args[0]] = self.inputs.popleft()
+            elif op == OUT:
+                self.outputs.append(args[0])
+            self.ip = next_ip
+
+
+def evaluate(value, assignment):
+    return value(**assignment) if isinstance(value, Poly) else value
+
+
+def solve_poly(poly, target, domains):
+    """Yield assignments {symbol: value} from `domains` for which poly == target."""
+    names = list(domains)
+    if isinstance(poly, Poly) and poly.is_affine():
+        # Solve for the symbol with the widest domain, enumerate the rest.
+        solved = max(poly.symbols, key=lambda name: len(domains[name]))
+        coeff = poly.coefficient((solved,))
+        others = poly - Poly.symbol(solved) * coeff
+        rest = [name for name in names if name != solved]
+        for values in product(*(domains[name] for name in rest)):
+            assignment = dict(zip(rest, values))
+            value, leftover = divmod(target - evaluate(others, assignment), coeff)
+            if not leftover and value in domains[solved]:
+                assignment[solved] = value
+                yield assignment
+        return
+
+    for values in product(*domains.values()):
+        assignment = dict(zip(names, values))
+        if evaluate(poly, assignment) == target:
+            yield assignment
+
+
+def solve(program, symbols, addr, target, domains, workers=None):
+    """Find memory pokes {address: value} that leave `target` at `addr` when the program halts.
+
+    `symbols` names the poked addresses and `domains` gives each name's
+    candidate values. The program is run once symbolically and the resulting
+    polynomial is solved directly. If the program needs a concrete value
+    where it has a symbolic one, this falls back to a concrete `sweep`.
+    Returns None when there is no solution.
+    """
+    try:
+        value = SymbolicVM(program, symbols).run().mem.get(addr, 0)
+        if value is UNKNOWN:
+            raise SymbolicBranch(f"Value at {addr} depends on a symbolic address")
+    except SymbolicBranch:
+        grid = Grid({a: domains[name] for a, name in symbols.items()})
+        return sweep(program, grid, MemoryEquals(addr, target), workers=workers)
+
+    for assignment in solve_poly(value, target, domains):
+        return {a: assignment[name] for a, name in symbols.items()}
+    return None
@@ -0,0 +1,428 @@
+from collections import deque
+
+from .memory import PagedMemory
+from .opcodes import (
+    ADD, ADD_RELATIVE_BASE, EQUALS, HALT, IMMEDIATE, IN, JUMP_FALSE, JUMP_TRUE,
+    LESS_THAN, MUL, OPS, OUT, POSITION, READ, RELATIVE, WRITE, IntcodeError, decode,
+)
+
+
+class Halt(Exception):
+    pass
+
+
+class NeedInput(Exception):
+    pass
+
+
+class Output(Exception):
+    pass
+
+
+_BODIES = {
+    ADD: "mem[{c}] = {a} + {b}\n    return ip + 4",
+    MUL: "mem[{c}] = {a} * {b}\n    return ip + 4",
+    IN: "if not vm.inputs:\n        raise NeedInput\n"
+        "    mem[{a}] = vm.inputs[0]\n    vm.inputs.popleft()\n    return ip + 2",
+    OUT: "vm.last_output = {a}\n    vm.outputs.append(vm.last_output)\n"
+         "    if vm.pause_on_output:\n        raise Output\n    return ip + 2",
+    JUMP_TRUE: "if {a} != 0:\n        t = {b}\n        if t < 0:\n            raise IndexError\n"
+               "        return t\n    return ip + 3",
+    JUMP_FALSE: "if {a} == 0:\n        t = {b}\n        if t < 0:\n            raise IndexError\n"
+                "        return t\n    return ip + 3",
+    LESS_THAN: "mem[{c}] = 1 if {a} < {b} else 0\n    return ip + 4",
+    EQUALS: "mem[{c}] = 1 if {a} == {b} else 0\n    return ip + 4",
+    ADD_RELATIVE_BASE: "vm.relative_base += {a}\n    return ip + 2",
+    HALT: "raise Halt",
+}
+
+
+def build_handler(instr, checked=False):
+    """Decode an instruction word once into a function `(vm, mem, ip) -> next ip`.
+
+    Memory addresses, and taken jump targets, are bound to locals first and
+    checked for being negative, which list indexing would otherwise wrap
+    around silently.
+    Addresses past the end raise IndexError on their own. Either way the
+    interpreter retries the instruction through `VM.slow_step`. `checked`
+    handlers also raise IndexError for writes to words in `vm.watch`, for
+    use alongside compiled code.
+    """
+    op, modes = decode(instr)
+    lines = []
+    addrs = []
+    args = {}
+    for i, (name, mode, kind) in enumerate(zip("abc", modes, OPS[op]), 1):
+        if mode == IMMEDIATE:
+            args[name] = f"mem[ip + {i}]"
+            continue
+        lines.append(f"{name}_ = " + ("" if mode == POSITION else "vm.relative_base + ") + f"mem[ip + {i}]")
+        addrs.append(f"{name}_ < 0")
+        if checked and kind == WRITE:
+            addrs.append(f"vm.watch[{name}_]")
+        args[name] = f"mem[{name}_]" if kind == READ else f"{name}_"
+    if addrs:
+        lines.append(f"if {' or '.join(addrs)}:\n        raise IndexError")
+    lines.append(_BODIES[op].format(**args))
+    body = "\n    ".join(lines)
+    namespace = {"Halt": Halt, "NeedInput": NeedInput, "Output": Output}
+    exec(f"def handler(vm, mem, ip):\n    {body}\n", namespace)
+    handler = namespace["handler"]
+    handler.op, handler.modes, handler.length = op, modes, 1 + len(modes)
+    return handler
+
+
+class HandlerTable(dict):
+    """Instruction word -> handler, filled in lazily the first time a word is executed."""
+
+    def __init__(self, checked=False):
+        super().__init__()
+        self.checked = checked
+
+    def __missing__(self, instr):
+        handler = self[instr] = build_handler(instr, self.checked)
+        return handler
+
+
+HANDLERS = HandlerTable()
+CHECKED_HANDLERS = HandlerTable(checked=True)
+
+
+def parse(text):
+    return [int(value) for value in text.strip().split(",")]
+
+
+def load(path):
+    with open(path) as f:
+        return parse(f.read())
+
+
+# Element type of the dense segment. int64 memory switches to Python ints
+# the first time a value outgrows it.
+MEMORY_TYPES = {"list": None, "int64": "q"}
+
+
+class Snapshot:
+    """Frozen VM state. Its memory pages are shared copy-on-write with every VM forked from it."""
+
+    def __init__(self, vm):
+        self.code = vm.code
+        self.backend = vm.backend
+        self.cfg = vm.cfg
+        self.memory = vm.memory.fork()
+        self.ip = vm.ip
+        self.relative_base = vm.relative_base
+        self.inputs = tuple(vm.inputs)
+        self.outputs = tuple(vm.outputs)
+        self.last_output = vm.last_output
+        self.halted = vm.halted
+
+    def fork(self, inp=None, backend=None):
+        vm = VM.__new__(VM)
+        vm.code = self.code
+        vm.set_backend(backend or self.backend, self.cfg)
+        vm.rewind(self)
+        if inp is not None:
+            vm.feed(inp)
+        return vm
+
+
+class VM:
+    profiler = None
+
+    def __init__(self, code, inp=None, backend="interpreter", cfg=None, memory="list"):
+        if memory not in MEMORY_TYPES:
+            raise IntcodeError(f"Unknown memory type: {memory}")
+        self.code = list(code)
+        self.set_backend(backend, cfg)
+        self.memory = PagedMemory(code, MEMORY_TYPES[memory])
+        self.reset_state()
+        if inp is not None:
+            self.feed(inp)
+
+    def set_backend(self, backend, cfg=None):
+        if backend not in ("interpreter", "compiled", "fused"):
+            raise IntcodeError(f"Unknown backend: {backend}")
+        if backend == "fused" and cfg is None:
+            from .analysis import cfg_for
+            cfg = cfg_for(self.code)
+        self.backend = backend
+        self.cfg = cfg
+
+    def reset_state(self, ip=0, relative_base=0, inputs=(), outputs=(), last_output=None, halted=False):
+        self.mem = self.memory.dense
+        self.ip = ip
+        self.relative_base = relative_base
+        self.inputs = deque(inputs)
+        self.sources = deque()
+        self.outputs = deque(outputs)
+        self.last_output = last_output
+        self.halted = halted
+        self.pause_on_output = False
+        self.skipped = 0
+        self.watch = None
+        self.checkpoint_log = None
+        self.compiler = None
+        if self.backend in ("compiled", "fused"):
+            from .compiler import Compiler
+            self.compiler = Compiler(self, self.cfg if self.backend == "fused" else None)
+
+    def snapshot(self):
+        return Snapshot(self)
+
+    def fork(self, inp=None):
+        """A new VM that continues independently from this one's current state."""
+        vm = VM.__new__(VM)
+        vm.code = self.code
+        vm.set_backend(self.backend, self.cfg)
+        vm.memory = self.memory.fork()
+        vm.reset_state(self.ip, self.relative_base, self.inputs, self.outputs,
+                       self.last_output, self.halted)
+        if inp is not None:
+            vm.feed(inp)
+        return vm
+
+    def rewind(self, snapshot):
+        """Put this VM back into the state captured by `snapshot`."""
+        self.memory = snapshot.memory.fork()
+        self.reset_state(snapshot.ip, snapshot.relative_base, snapshot.inputs,
+                         snapshot.outputs, snapshot.last_output, snapshot.halted)
+
+    def __getstate__(self):
+        """Compiled blocks are rebuilt after unpickling rather than sent along."""
+        state = self.__dict__.copy()
+        state.update(compiler=None, watch=None, checkpoint_log=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.backend in ("compiled", "fused"):
+            from .compiler import Compiler
+            self.compiler = Compiler(self, self.cfg if self.backend == "fused" else None)
+
+    def checkpoint(self, path):
+        """Save the VM's state to `path`. Saving to the same file again only appends what changed."""
+        from .checkpoint import save
+        self.checkpoint_log = save(self, path)
+
+    @classmethod
+    def restore(cls, path, backend="interpreter", cfg=None):
+        """A VM that resumes from the newest checkpoint in `path`."""
+        from .checkpoint import restore
+        return restore(path, backend, cfg)
+
+    def __getitem__(self, index):
+        return self.load(index)
+
+    def __setitem__(self, index, val):
+        self.store(index, val)
+
+    def load(self, addr):
+        return self.memory.load(addr)
+
+    def store(self, addr, val):
+        watch = self.watch
+        if watch is not None and 0 <= addr < len(watch) and watch[addr]:
+            self.compiler.invalidate(addr)
+        self.memory.store(addr, val)
+        self.mem = self.memory.dense
+
+    def feed(self, inp):
+        """Queue an int, a sized collection of ints, or any other iterable.
+
+        Plain iterables (generators, file readers, ...) are not drained up
+        front. The VM pulls one value at a time when it reaches an input
+        instruction with nothing queued, so an endless source is fine.
+        Pending iterables belong to this VM alone and are not carried over
+        by `fork` or `snapshot`.
+        """
+        if self.sources:
+            self.sources.append(iter([inp]) if isinstance(inp, int) else iter(inp))
+        elif isinstance(inp, int):
+            self.inputs.append(inp)
+        elif hasattr(inp, '__len__'):
+            self.inputs.extend(inp)
+        else:
+            self.sources.append(iter(inp))
+
+    def pull(self):
+        """Move the next value from the pending iterables into `inputs`; False once they run dry."""
+        sources = self.sources
+        while sources:
+            for value in sources[0]:
+                self.inputs.append(value)
+                return True
+            sources.popleft()
+        return False
+
+    @property
+    def waiting(self):
+        return not self.halted and not self.inputs and not self.sources and self.load(self.ip) % 100 == IN
+
+    def run(self):
+        """Run until the program halts or blocks on input; return the last output."""
+        self.execute(pause_on_output=False)
+        return self.last_output
+
+    def next_output(self):
+        """Run until the next output and return it, or None if the program halted or blocked."""
+        if not self.outputs:
+            self.execute(pause_on_output=True)
+        return self.outputs.popleft() if self.outputs else None
+
+    def stream(self, inp=None):
+        """Yield outputs one at a time as the program produces them.
+
+        Nothing is buffered beyond the value being handed over, so a program
+        with millions of outputs runs in constant memory, and the consumer
+        sees the first value before the VM halts. Stops when the program
+        halts or blocks on input.
+        """
+        if inp is not None:
+            self.feed(inp)
+        while True:
+            value = self.next_output()
+            if value is None:
+                return
+            yield value
+
+    async def astream(self, source=None):
+        """Async `stream`: when the VM blocks on input, the next value is awaited from `source`."""
+        source = None if source is None else aiter(source)
+        while True:
+            value = self.next_output()
+            if value is not None:
+                yield value
+            elif self.halted or source is None:
+                return
+            else:
+                try:
+                    self.feed(await anext(source))
+                except StopAsyncIteration:
+                    return
+
+    def execute(self, pause_on_output=False):
+        self.pause_on_output = pause_on_output
+        self.mem = self.memory.own_dense()
+        self.engine()()
+
+    def engine(self):
+        """The loop that runs this VM's code: the profiler's, the compiler's or the interpreter's."""
+        if self.profiler is not None:
+            return self.profiler.execute
+        if self.compiler is not None:
+            return self.compiler.execute
+        return self.interpret
+
+    def interpret(self):
+        mem = self.mem
+        handlers = HANDLERS
+        ip = self.ip
+        slow = False
+        while not self.halted:
+            try:
+                if slow:
+                    slow = False
+                    ip = self.slow_step(ip)
+                    mem = self.mem
+                while True:
+                    ip = handlers[mem[ip]](self, mem, ip)
+            except IndexError:
+                slow = True
+            except OverflowError:
+                mem = self.widen()
+            except Output:
+                ip += 2
+                break
+            except NeedInput:
+                if not self.sources or not self.pull():
+                    break
+            except Halt:
+                self.halted = True
+        self.ip = ip
+
+    def run_slice(self, budget):
+        """Run about `budget` instructions and return how many ran.
+
+        This is the preemptible path for schedulers. A compiled VM keeps
+        its blocks across slices and may overrun the budget by the rest of
+        the block it was in (`Compiler.run_slice`). Otherwise at most
+        `budget` instructions are interpreted.
+        """
+        self.pause_on_output = False
+        mem = self.mem = self.memory.own_dense()
+        if self.compiler is not None:
+            return self.compiler.run_slice(budget)
+        handlers = HANDLERS
+        ip = self.ip
+        left = budget
+        slow = False
+        while not self.halted and left:
+            try:
+                if slow:
+                    slow = False
+                    ip = self.slow_step(ip)
+                    mem = self.mem
+                    left -= 1
+                while left:
+                    ip = handlers[mem[ip]](self, mem, ip)
+                    left -= 1
+            except IndexError:
+                slow = True
+            except OverflowError:
+                mem = self.widen()
+            except NeedInput:
+                if not self.pull():
+                    break
+            except Halt:
+                self.halted = True
+                left -= 1
+        self.ip = ip
+        return budget - left
+
+    def widen(self):
+        """Move memory to Python ints after an int64 overflow; the instruction is then retried."""
+        self.mem = self.memory.widen()
+        return self.mem
+
+    def slow_step(self, ip):
+        """Execute one instruction through bounds-checked memory accesses."""
+        op, modes = decode(self.load(ip))
+        args = []
+        for i, (mode, kind) in enumerate(zip(modes, OPS[op]), 1):
+            a = self.load(ip + i)
+            if mode == RELATIVE:
+                a += self.relative_base
+            if mode != IMMEDIATE and kind == READ:
+                a = self.load(a)
+            args.append(a)
+        next_ip = ip + 1 + len(args)
+
+        if op == IN:
+            if not self.inputs:
+                raise NeedInput
+            self.store(args[0], self.inputs[0])
+            self.inputs.popleft()
+        elif op == OUT:
+            self.last_output = args[0]
+            self.outputs.append(args[0])
+            if self.pause_on_output:
+                raise Output
+        elif op == ADD:
+            self.store(args[2], args[0] + args[1])
+        elif op == MUL:
+            self.store(args[2], args[0] * args[1])
+        elif op == LESS_THAN:
+            self.store(args[2], 1 if args[0] < args[1] else 0)
+        elif op == EQUALS:
+            self.store(args[2], 1 if args[0] == args[1] else 0)
+        elif op in (JUMP_TRUE, JUMP_FALSE):
+            if (args[0] != 0) == (op == JUMP_TRUE):
+                if args[1] < 0:
+                    raise IntcodeError(f"Jump to negative address: {args[1]}")
+                next_ip = args[1]
+        elif op == ADD_RELATIVE_BASE:
+            self.relative_base += args[0]
+        elif op == HALT:
+            raise Halt
+        return next_ip
@@ -0,0 +1,5 @@
+from .segments import Segment, SegmentArray, segments
+from .reader import load, read_wires
+from .interval_tree import IntervalTree
+from .sweep import crossings, intersections
+from .index import GridIndex
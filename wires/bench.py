@@ -0,0 +1,95 @@
+"""Rough timings for the wire intersection engines: python -m wires.bench"""
+import random
+import time
+
+from .index import GridIndex
+from .segments import DIRECTIONS, segments
+from .sweep import intersections
+
+
+def timed(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def random_wire(moves=300, longest=1000, seed=None):
+    rng = random.Random(seed)
+    return [f"{rng.choice('LRUD')}{rng.randint(1, longest)}" for _ in range(moves)]
+
+
+def walk(moves):
+    """First-visit steps of every cell, one step at a time, as day3 used to do it."""
+    x = y = length = 0
+    visits = {}
+    for move in moves:
+        for _ in range(int(move[1:])):
+            x += DIRECTIONS[move[0]][0]
+            y += DIRECTIONS[move[0]][1]
+            length += 1
+            if (x, y) not in visits:
+                visits[(x, y)] = length
+    return visits
+
+
+def answers(found):
+    found = [(x, y, steps) for x, y, steps in found if x or y]
+    return min(abs(x) + abs(y) for x, y, _ in found), min(steps for _, _, steps in found)
+
+
+def bench_engines(moves=300, longest=1000):
+    a, b = random_wire(moves, longest, seed=1), random_wire(moves, longest, seed=2)
+
+    def cell_walk():
+        pa, pb = walk(a), walk(b)
+        return answers((x, y, pa[x, y] + pb[x, y]) for x, y in pa.keys() & pb.keys())
+
+    def sweep():
+        return answers(intersections(segments(a), segments(b)))
+
+    engines = [("cell walk", cell_walk), ("sweep", sweep)]
+    try:
+        from .cells import cell_intersections
+    except ImportError:
+        print("cells: NumPy not installed, skipped")
+    else:
+        def numpy_cells():
+            x, y, steps = cell_intersections(a, b)
+            return int((abs(x) + abs(y)).min()), int(steps.min())
+
+        engines.insert(1, ("numpy cells", numpy_cells))
+    baseline = None
+    for name, fn in engines:
+        elapsed, result = timed(fn)
+        baseline = baseline or elapsed
+        print(f"{moves} moves up to {longest} [{name:>11}] {elapsed * 1000:8.2f}ms  "
+              f"x{baseline / elapsed:.1f}  -> {result}")
+
+
+def bench_index(count=60, moves=300, longest=1000, workers=None):
+    wires = [segments(random_wire(moves, longest, seed=seed)) for seed in range(count)]
+
+    def every_pair():
+        best = {}
+        for i in range(count):
+            for j in range(i + 1, count):
+                found = list(intersections(wires[i], wires[j]))
+                if found:
+                    best[i, j] = (min(abs(x) + abs(y) for x, y, _ in found), min(steps for _, _, steps in found))
+        return best
+
+    baseline = None
+    for name, fn in (("pair sweeps", every_pair), ("grid index", lambda: GridIndex(wires).pairs(workers))):
+        elapsed, result = timed(fn, repeat=1)
+        baseline = baseline or elapsed
+        print(f"{count} wires, all pairs [{name:>11}] {elapsed:6.2f}s  x{baseline / elapsed:.1f}  "
+              f"-> {len(result)} pairs meet")
+
+
+if __name__ == '__main__':
+    bench_engines()
+    bench_index()
@@ -0,0 +1,47 @@
+"""Cell-by-cell wire paths as NumPy arrays. Needs NumPy."""
+import numpy as np
+
+from .segments import DIRECTIONS
+
+# Coordinates are packed into one int64 key, 32 bits each after adding this
+# offset, which leaves the sign bit clear.
+OFFSET = 1 << 30
+
+
+def parse_moves(moves):
+    """Directions (n, 2) and lengths (n,) of moves like ['R8', 'U5']."""
+    try:
+        steps = np.array([DIRECTIONS[move[0]] for move in moves], dtype=np.int64).reshape(-1, 2)
+    except KeyError as e:
+        raise ValueError(f"Bad move direction: {e.args[0]!r}") from None
+    lengths = np.array([int(move[1:]) for move in moves], dtype=np.int64)
+    return steps, lengths
+
+
+def cell_keys(moves):
+    """Key of every cell the wire enters, in order; the cell at index i is i + 1 steps along."""
+    steps, lengths = parse_moves(moves)
+    path = np.cumsum(np.repeat(steps, lengths, axis=0), axis=0)
+    if path.size and np.abs(path).max() >= OFFSET:
+        raise ValueError("Wire leaves the supported coordinate range (+/- 2**30)")
+    return ((path[:, 0] + OFFSET) << 32) | (path[:, 1] + OFFSET)
+
+
+def first_visits(moves):
+    """Sorted unique cell keys of a wire and the step count of its first visit to each."""
+    keys, first = np.unique(cell_keys(moves), return_index=True)
+    return keys, first + 1
+
+
+def decode(keys):
+    return (keys >> 32) - OFFSET, (keys & 0xFFFFFFFF) - OFFSET
+
+
+def cell_intersections(a, b):
+    """x, y and combined first-visit steps of the cells, other than the origin, where wires `a` and `b` meet."""
+    keys_a, steps_a = first_visits(a)
+    keys_b, steps_b = first_visits(b)
+    keys, ia, ib = np.intersect1d(keys_a, keys_b, assume_unique=True, return_indices=True)
+    x, y = decode(keys)
+    keep = (x != 0) | (y != 0)
+    return x[keep], y[keep], (steps_a[ia] + steps_b[ib])[keep]
@@ -0,0 +1,162 @@
+import heapq
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from statistics import median
+
+from .reader import load
+from .sweep import meeting_cells
+
+# A segment spans at most length / cell + 2 buckets, so a cell of at least
+# total length / ((MAX_ENTRIES_PER_SEGMENT - 2) * segments) keeps the index
+# within that many entries per segment however the lengths are spread.
+MAX_ENTRIES_PER_SEGMENT = 4
+
+
+class GridIndex:
+    """Segments of many wires bucketed by the grid cells they pass through.
+
+    The grid is `cell` units on a side, by default the median segment
+    length, so a typical segment lands in one or two buckets. The default
+    is raised when a few long segments would otherwise fill far more
+    buckets than there are segments. Two segments
+    can only meet in a bucket they both pass through, so every query only
+    compares segments of different wires that share a bucket, instead of
+    every wire against every other. A pair of segments is handled in just
+    one bucket: the one holding the low corner of their overlap.
+
+    Queries can be shared out across worker processes, each taking a slice
+    of the buckets.
+    """
+
+    def __init__(self, wires, cell=None):
+        self.wires = list(wires)
+        lengths = [segment.length for wire in self.wires for segment in wire]
+        if cell is None:
+            cell = max(1, int(median(lengths))) if lengths else 1
+            if lengths:
+                spread = (MAX_ENTRIES_PER_SEGMENT - 2) * len(lengths)
+                cell = max(cell, -(-sum(lengths) // spread))
+        self.cell = cell
+        self.buckets = defaultdict(list)
+        for i, wire in enumerate(self.wires):
+            for n, segment in enumerate(wire):
+                xlo, xhi, ylo, yhi = box = segment.box()
+                for bx in range(xlo // cell, xhi // cell + 1):
+                    for by in range(ylo // cell, yhi // cell + 1):
+                        self.buckets[bx, by].append((i, n, box))
+
+    @classmethod
+    def load(cls, path, cell=None):
+        return cls(load(path), cell)
+
+    def meetings(self, keys):
+        """(i, j, sa, sb, overlap) for each pair of segments from wires i < j that meet in the buckets `keys`."""
+        cell = self.cell
+        for key in keys:
+            entries = self.buckets[key]
+            for k, (i, n, (axlo, axhi, aylo, ayhi)) in enumerate(entries):
+                for j, m, (bxlo, bxhi, bylo, byhi) in entries[k + 1:]:
+                    if i == j or axlo > bxhi or bxlo > axhi or aylo > byhi or bylo > ayhi:
+                        continue
+                    xlo, ylo = max(axlo, bxlo), max(aylo, bylo)
+                    if (xlo // cell, ylo // cell) != key:
+                        continue
+                    box = xlo, min(axhi, bxhi), ylo, min(ayhi, byhi)
+                    sa, sb = self.wires[i][n], self.wires[j][m]
+                    yield (i, j, sa, sb, box) if i < j else (j, i, sb, sa, box)
+
+    def pairs(self, workers=None):
+        """{(i, j): (distance, steps)} for every pair of wires that meet.
+
+        `distance` is the Manhattan distance from the origin to their
+        closest crossing and `steps` the fewest combined steps to reach one.
+        """
+        best = {}
+        for part in self.run(_pairs, workers):
+            for pair, (distance, steps) in part.items():
+                if pair in best:
+                    distance = min(distance, best[pair][0])
+                    steps = min(steps, best[pair][1])
+                best[pair] = distance, steps
+        return best
+
+    def closest(self, workers=None):
+        """Distance and fewest steps to a crossing of any two of the wires, or None."""
+        best = self.pairs(workers).values()
+        if not best:
+            return None
+        return min(distance for distance, _ in best), min(steps for _, steps in best)
+
+    def nearest(self, k, workers=None):
+        """The k crossings closest to the origin, as sorted (distance, x, y, i, j)."""
+        found = set()
+        for part in self.run(_nearest, workers, k):
+            found.update(part)
+        return heapq.nsmallest(k, found)
+
+    def run(self, task, workers, *args):
+        """Results of `task` on slices of the buckets, from a pool of `workers` processes."""
+        keys = sorted(self.buckets)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(keys) < 2:
+            return [task(self, keys, *args)]
+        size = -(-len(keys) // (4 * workers))
+        slices = [keys[start:start + size] for start in range(0, len(keys), size)]
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(self,)) as pool:
+            return list(pool.map(_run_slice, [(task, part, args) for part in slices]))
+
+
+def _pairs(index, keys):
+    best = {}
+    for i, j, sa, sb, box in index.meetings(keys):
+        for x, y, steps in meeting_cells(sa, sb, box):
+            distance = abs(x) + abs(y)
+            if (i, j) in best:
+                distance = min(distance, best[i, j][0])
+                steps = min(steps, best[i, j][1])
+            best[i, j] = distance, steps
+    return best
+
+
+def _nearest(index, keys, k):
+    found = set()
+    for i, j, _, _, box in index.meetings(keys):
+        for x, y in _nearest_cells(box, k):
+            found.add((abs(x) + abs(y), x, y, i, j))
+    return heapq.nsmallest(k, found)
+
+
+def _nearest_cells(box, k):
+    """Up to k cells of a box one cell wide or high, nearest the origin first, not counting the origin."""
+    xlo, xhi, ylo, yhi = box
+    if xlo == xhi:
+        return [(xlo, y) for y in _nearest_values(ylo, yhi, k + 1) if (xlo, y) != (0, 0)][:k]
+    return [(x, ylo) for x in _nearest_values(xlo, xhi, k + 1) if (x, ylo) != (0, 0)][:k]
+
+
+def _nearest_values(lo, hi, k):
+    """Up to k integers in [lo, hi], smallest magnitude first."""
+    start = min(max(0, lo), hi)
+    values = [start]
+    below, above = start - 1, start + 1
+    while len(values) < k and (below >= lo or above <= hi):
+        if above > hi or (below >= lo and abs(below) <= abs(above)):
+            values.append(below)
+            below -= 1
+        else:
+            values.append(above)
+            above += 1
+    return values
+
+
+_worker = {}
+
+
+def _init_worker(index):
+    _worker['index'] = index
+
+
+def _run_slice(job):
+    task, keys, args = job
+    return task(_worker['index'], keys, *args)
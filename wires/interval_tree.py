@@ -0,0 +1,74 @@
+from array import array
+from bisect import bisect_left
+
+# Sentinels for the int64 node bounds.
+EMPTY = -(1 << 63)
+UNBOUNDED = (1 << 63) - 1
+
+
+class IntervalTree:
+    """A changing set of closed intervals, queried for the ones overlapping a range.
+
+    The starts that will ever be stored are given up front, and the tree
+    is a complete binary tree over them, laid out in int64 arrays. Each
+    leaf holds the intervals stored at its start. Every node records the
+    smallest start and the largest end below it, so a query only descends
+    into subtrees that can overlap it: O(log n + k) for k overlaps, where
+    n is the number of distinct starts. Insert and remove are O(log n),
+    plus a scan of the leaf on removal. Ends and starts must fit in int64.
+    """
+
+    def __init__(self, starts):
+        self.starts = array('q', sorted(set(starts)))
+        size = 1
+        while size < len(self.starts):
+            size *= 2
+        self.size = size
+        self.leaves = [None] * len(self.starts)
+        self.high = array('q', [EMPTY]) * (2 * size)
+        self.low = array('q', [UNBOUNDED]) * (2 * size)
+        self.low[size:size + len(self.starts)] = self.starts
+        for node in range(size - 1, 0, -1):
+            self.low[node] = self.low[2 * node]
+
+    def insert(self, start, end, item):
+        i = bisect_left(self.starts, start)
+        if self.leaves[i] is None:
+            self.leaves[i] = []
+        self.leaves[i].append((end, item))
+        node = self.size + i
+        while node and self.high[node] < end:
+            self.high[node] = end
+            node //= 2
+
+    def remove(self, start, end, item):
+        i = bisect_left(self.starts, start)
+        leaf = self.leaves[i]
+        leaf.remove((end, item))
+        if not leaf:
+            self.leaves[i] = None
+        node = self.size + i
+        self.high[node] = max((stored for stored, _ in leaf), default=EMPTY)
+        node //= 2
+        while node:
+            high = max(self.high[2 * node], self.high[2 * node + 1])
+            if high == self.high[node]:
+                break
+            self.high[node] = high
+            node //= 2
+
+    def overlapping(self, lo, hi):
+        """Items whose interval shares at least one point with [lo, hi]."""
+        high, low, size = self.high, self.low, self.size
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            if high[node] < lo or low[node] > hi:
+                continue
+            if node >= size:
+                for end, item in self.leaves[node - size]:
+                    if end >= lo:
+                        yield item
+            else:
+                stack.append(2 * node + 1)
+                stack.append(2 * node)
@@ -0,0 +1,46 @@
+import sys
+
+from .segments import SegmentArray
+
+CHUNK_SIZE = 1 << 16
+
+
+def read_wires(f, chunk_size=CHUNK_SIZE):
+    """Wires from a text stream of comma-separated moves, one wire per line.
+
+    The text is read `chunk_size` characters at a time and each move is
+    added to its wire's SegmentArray as soon as it is complete. Only the
+    current chunk and a partial move are held as text, so memory grows
+    with the number of segments and not with the size of the input.
+    Blank lines are skipped.
+    """
+    wires = []
+    wire = SegmentArray()
+    pending = ''
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        lines = (pending + chunk).split('\n')
+        pending = ''
+        for n, line in enumerate(lines):
+            moves = line.split(',')
+            if n == len(lines) - 1:
+                pending = moves.pop()
+            wire.extend(move for move in map(str.strip, moves) if move)
+            if n < len(lines) - 1 and (len(wire) or wire.total):
+                wires.append(wire)
+                wire = SegmentArray()
+    if pending.strip():
+        wire.move(pending.strip())
+    if len(wire) or wire.total:
+        wires.append(wire)
+    return wires
+
+
+def load(path, chunk_size=CHUNK_SIZE):
+    """Wires from a file with one wire per line, or from stdin if `path` is '-'."""
+    if path == '-':
+        return read_wires(sys.stdin, chunk_size)
+    with open(path) as f:
+        return read_wires(f, chunk_size)
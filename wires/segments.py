@@ -0,0 +1,88 @@
+from array import array
+from collections import namedtuple
+
+DIRECTIONS = {'L': (-1, 0), 'R': (1, 0), 'U': (0, 1), 'D': (0, -1)}
+CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+DELTAS = list(DIRECTIONS.values())
+
+
+class Segment(namedtuple('Segment', 'x y dx dy length steps')):
+    """A straight run of wire: `length` cells from (x, y) in direction (dx, dy).
+
+    `steps` is how far along the wire (x, y) is. Both ends belong to the
+    segment, so a corner is shared with the next one, at the same step count.
+    """
+
+    @property
+    def end(self):
+        return self.x + self.dx * self.length, self.y + self.dy * self.length
+
+    @property
+    def horizontal(self):
+        return self.dy == 0
+
+    def box(self):
+        """(xlo, xhi, ylo, yhi) of the cells the segment covers."""
+        x2, y2 = self.end
+        return min(self.x, x2), max(self.x, x2), min(self.y, y2), max(self.y, y2)
+
+    def steps_to(self, x, y):
+        """Steps along the wire to (x, y), which must be on the segment."""
+        return self.steps + abs(x - self.x) + abs(y - self.y)
+
+
+class SegmentArray:
+    """The segments of one wire, in flat arrays of int64 rather than as objects.
+
+    Built a move at a time with `move`, so a wire can be read straight off
+    a stream. Indexing and iteration give `Segment`s, made as they are
+    asked for, so the engines take a SegmentArray wherever they take a list
+    of segments. Zero-length moves add no segment.
+    """
+
+    def __init__(self, moves=()):
+        self.xs = array('q')
+        self.ys = array('q')
+        self.directions = array('b')
+        self.lengths = array('q')
+        self.steps = array('q')
+        self.x = self.y = self.total = 0
+        self.extend(moves)
+
+    def move(self, move):
+        self.extend((move,))
+
+    def extend(self, moves):
+        x, y, total = self.x, self.y, self.total
+        for move in moves:
+            code = CODES.get(move[:1])
+            if code is None:
+                raise ValueError(f"Bad move: {move!r}")
+            n = int(move[1:])
+            if n:
+                self.xs.append(x)
+                self.ys.append(y)
+                self.directions.append(code)
+                self.lengths.append(n)
+                self.steps.append(total)
+                dx, dy = DELTAS[code]
+                x += dx * n
+                y += dy * n
+                total += n
+        self.x, self.y, self.total = x, y, total
+        return self
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, i):
+        return Segment(self.xs[i], self.ys[i], *DELTAS[self.directions[i]], self.lengths[i], self.steps[i])
+
+    def __iter__(self):
+        for x, y, code, length, steps in zip(self.xs, self.ys, self.directions, self.lengths, self.steps):
+            yield Segment(x, y, *DELTAS[code], length, steps)
+
+
+def segments(moves):
+    """Segments of a wire given as moves like ['R8', 'U5', 'L5']."""
+    return SegmentArray(moves)
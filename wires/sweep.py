@@ -0,0 +1,94 @@
+import heapq
+from array import array
+
+from .interval_tree import IntervalTree
+
+INSERT, REMOVE = 0, 1
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def crossings(a, b):
+    """Pairs (sa, sb) of segments from wires `a` and `b` that share at least one cell.
+
+    A line sweeps across x. Each segment is live while the line is within
+    its x-range, and while it is live its y-range sits in an interval tree
+    for its wire: a point for a horizontal segment, the whole span for a
+    vertical one. A segment going live is checked against the other wire's
+    tree, so each touching pair is reported once, by whichever of the two
+    goes live second. This finds crossings and runs that lie on top of each
+    other alike, in time that depends on the number of segments and
+    crossings, not on the length of the wires. The sweep keeps its own
+    state in int64 arrays indexed by segment, and only makes `Segment`s for
+    the pairs it reports, so a SegmentArray is never expanded.
+    """
+    wires = (a, b)
+    boxes = [_boxes(wire) for wire in wires]
+    trees = [IntervalTree(ylo) for _, _, ylo, _ in boxes]
+    events = heapq.merge(*(_events(boxes[side], action, side) for side in (0, 1) for action in (INSERT, REMOVE)))
+    for _, action, side, n in events:
+        _, _, ylo, yhi = boxes[side]
+        if action == REMOVE:
+            trees[side].remove(ylo[n], yhi[n], n)
+            continue
+        for other in trees[1 - side].overlapping(ylo[n], yhi[n]):
+            yield (a[n], b[other]) if side == 0 else (a[other], b[n])
+        trees[side].insert(ylo[n], yhi[n], n)
+
+
+def _boxes(wire):
+    """The xlo, xhi, ylo and yhi of every segment of a wire, as four arrays."""
+    boxes = [array('q') for _ in range(4)]
+    appends = [column.append for column in boxes]
+    for segment in wire:
+        for append, value in zip(appends, segment.box()):
+            append(value)
+    return boxes
+
+
+def _events(boxes, action, side):
+    """(x, action, side, n) for each segment, ordered by the x where it goes live or dies."""
+    xs = boxes[0] if action == INSERT else boxes[1]
+    for n in array('q', sorted(range(len(xs)), key=xs.__getitem__)):
+        yield xs[n], action, side, n
+
+
+def intersections(a, b):
+    """(x, y, combined steps) for the cells where wires `a` and `b` meet, other than the origin.
+
+    A cell the wires meet at more than once may be listed several times;
+    the smallest combined steps among them are those of each wire's first
+    visit. See `meeting_cells` for which cells of an overlap are listed.
+    """
+    for sa, sb in crossings(a, b):
+        yield from meeting_cells(sa, sb)
+
+
+def overlap(sa, sb):
+    """(xlo, xhi, ylo, yhi) of the cells two segments share, or None."""
+    axlo, axhi, aylo, ayhi = sa.box()
+    bxlo, bxhi, bylo, byhi = sb.box()
+    xlo, xhi = max(axlo, bxlo), min(axhi, bxhi)
+    ylo, yhi = max(aylo, bylo), min(ayhi, byhi)
+    if xlo > xhi or ylo > yhi:
+        return None
+    return xlo, xhi, ylo, yhi
+
+
+def meeting_cells(sa, sb, box=None):
+    """(x, y, combined steps) for cells shared by two segments that can be closest or cheapest.
+
+    Where the segments overlap along a line, the steps vary linearly along
+    the overlap, so only its ends, the cell nearest the origin, and the
+    cells next to the origin if it lies on the overlap are listed. The
+    origin itself never is. `box` is their overlap, if already known.
+    """
+    box = box or overlap(sa, sb)
+    if box is None:
+        return
+    xlo, xhi, ylo, yhi = box
+    cells = {(xlo, ylo), (xhi, yhi), (min(max(0, xlo), xhi), min(max(0, ylo), yhi))}
+    if (0, 0) in cells:
+        cells.discard((0, 0))
+        cells.update((x, y) for x, y in NEIGHBOURS if xlo <= x <= xhi and ylo <= y <= yhi)
+    for x, y in cells:
+        yield x, y, sa.steps_to(x, y) + sb.steps_to(x, y)